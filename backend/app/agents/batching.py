@@ -0,0 +1,111 @@
+"""
+/agents/batching.py
+
+Micro-batching for non-streaming LLM calls.
+
+/chat/message is used to fill thread history in bulk, so many requests arrive
+at almost the same moment. Calls that arrive within LLM_BATCH_MAX_WAIT_MS of
+each other (up to LLM_BATCH_MAX_SIZE) are grouped and the results are fanned
+back out to the callers.
+
+The chat model has no batch endpoint: a batch is still one upstream request
+per item, and each of them takes its own LLM slot, so LLM_MAX_CONCURRENCY
+stays the process-wide cap. What grouping adds is a per-batch fan-out limit
+(LLM_BATCH_MAX_CONCURRENCY), so a bulk burst cannot take every LLM slot away
+from interactive chats.
+
+Streaming requests never go through the batcher: waiting for a batch would
+delay their first token.
+"""
+from typing import Any, Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+import asyncio
+import contextvars
+import logging
+
+from app.core.concurrency import llm_slot
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects submissions for a short window and runs them as one batch"""
+
+    def __init__(
+        self,
+        call_batch: Callable[[List[T]], Awaitable[List[Any]]],
+        max_batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None
+    ):
+        self.call_batch = call_batch
+        self.max_batch_size = settings.LLM_BATCH_MAX_SIZE if max_batch_size is None else max_batch_size
+        self.max_wait = settings.LLM_BATCH_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item: T) -> R:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._dispatch)
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Callers that gave up while waiting are dropped from the batch
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        if batch:
+            # A fresh context, so the batch is not traced as part of whichever caller filled it
+            task = asyncio.create_task(self._run(batch), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        logger.info(f"Running LLM batch of {len(batch)}")
+        try:
+            results = await self.call_batch([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
+
+
+def llm_batch_caller(llm: Any) -> Callable[[List[Any]], Awaitable[List[Any]]]:
+    """Batch function for a LangChain chat model: one LLM slot per item, bounded fan-out, errors per item"""
+    async def call_batch(inputs: List[Any]) -> List[Any]:
+        fan_out = asyncio.Semaphore(settings.LLM_BATCH_MAX_CONCURRENCY)
+
+        async def call_one(messages: Any) -> Any:
+            async with fan_out, llm_slot():
+                return await llm.ainvoke(messages)
+
+        return await asyncio.gather(*(call_one(messages) for messages in inputs), return_exceptions=True)
+    return call_batch
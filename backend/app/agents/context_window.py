@@ -0,0 +1,138 @@
+"""
+/agents/context_window.py
+
+Token-budgeted conversation window for the agent.
+
+The window keeps the newest whole turns (a turn starts at a human message)
+that fit in the budget for the thread's context_type. Older turns are folded
+into a rolling summary, which is carried in the graph state as
+{"text": ..., "upto": <number of leading messages already summarized>} so each
+message is summarized only once.
+"""
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import json
+import logging
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tokens added per message for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+TokenCounter = Callable[[str], int]
+Summarizer = Callable[[str, List[BaseMessage]], Awaitable[str]]
+
+
+def _tiktoken_counter() -> TokenCounter:
+    """Count with tiktoken, falling back to a length heuristic if the encoding is unavailable."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(settings.CONTEXT_TOKENIZER)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable ({e}), estimating tokens from length")
+        return lambda text: max(1, len(text) // 4)
+
+
+class CachedTokenCounter:
+    """Wraps a token counter with an LRU cache so unchanged history is never retokenized."""
+
+    def __init__(self, counter: TokenCounter, maxsize: int = 4096):
+        self._count = lru_cache(maxsize=maxsize)(counter)
+
+    def __call__(self, text: str) -> int:
+        return self._count(text)
+
+    def cache_info(self):
+        return self._count.cache_info()
+
+
+_default_counter: Optional[CachedTokenCounter] = None
+
+
+def get_token_counter() -> CachedTokenCounter:
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = CachedTokenCounter(_tiktoken_counter(), settings.CONTEXT_TOKEN_CACHE_SIZE)
+    return _default_counter
+
+
+def message_text(message: BaseMessage) -> str:
+    """The text of a message as it counts against the budget."""
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps([{"name": c.get("name"), "args": c.get("args")} for c in tool_calls])
+    return text
+
+
+class ContextWindow:
+    """Selects the messages to send to the model within a token budget."""
+
+    def __init__(
+        self,
+        budget: int,
+        counter: Optional[TokenCounter] = None,
+        summarizer: Optional[Summarizer] = None
+    ):
+        self.budget = budget
+        self.counter = counter or get_token_counter()
+        self.summarizer = summarizer
+
+    @classmethod
+    def for_context(cls, context_type: Optional[str], **kwargs) -> "ContextWindow":
+        budget = settings.CONTEXT_TOKEN_BUDGETS.get(context_type or "", settings.CONTEXT_TOKEN_BUDGET_DEFAULT)
+        return cls(budget, **kwargs)
+
+    def count(self, message: BaseMessage) -> int:
+        return self.counter(message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+
+    async def select(
+        self,
+        messages: List[BaseMessage],
+        summary: Optional[Dict[str, Any]] = None,
+        reserved_tokens: int = 0
+    ) -> Tuple[List[BaseMessage], Dict[str, Any]]:
+        """
+        Pick the newest turns that fit the budget and update the rolling summary.
+
+        Args:
+            messages: The full conversation history
+            summary: The rolling summary from the previous turn, if any
+            reserved_tokens: Tokens already spent on the system prompt
+
+        Returns:
+            (window, summary) where window is the tail of `messages` to send
+        """
+        summary = dict(summary or {"text": "", "upto": 0})
+        summarized_upto = min(summary.get("upto", 0), len(messages))
+        remaining = self.budget - reserved_tokens - self.counter(summary.get("text", ""))
+
+        # Walk turns from newest to oldest; the latest turn is always kept
+        cut = len(messages)
+        turn_tokens = 0
+        for index in range(len(messages) - 1, summarized_upto - 1, -1):
+            turn_tokens += self.count(messages[index])
+            if isinstance(messages[index], HumanMessage) or index == summarized_upto:
+                if cut < len(messages) and turn_tokens > remaining:
+                    break
+                remaining -= turn_tokens
+                turn_tokens = 0
+                cut = index
+
+        if cut > summarized_upto:
+            dropped = messages[summarized_upto:cut]
+            logger.info(f"Context window folds {len(dropped)} older messages into the summary")
+            try:
+                if self.summarizer:
+                    summary["text"] = await self.summarizer(summary.get("text", ""), dropped)
+                summary["upto"] = cut
+            except Exception as e:
+                # Leave the summary as it was so the next turn retries these messages
+                logger.error(f"Error summarizing conversation history: {e}")
+
+        return messages[max(cut, summarized_upto):], summary
@@ -0,0 +1,171 @@
+"""
+/agents/llm_cache.py
+
+Response cache for the agent's LLM call.
+
+A response is keyed by a hash of everything that determines it: the system
+prompt, the (already trimmed) history, the bound tool schemas and the model
+parameters. Message timestamps and ids are left out, so the same request in
+another thread hits the same entry.
+
+Two tiers:
+- an in-process byte-bounded LRU (always on unless LLM_CACHE_MAX_BYTES is 0)
+- an optional shared Postgres table (LLM_CACHE_DB_ENABLED), so workers and
+  restarts share hits; expired rows are deleted every LLM_CACHE_DB_PURGE_EVERY
+  writes
+
+Entries live for LLM_CACHE_TTLS[context_type] seconds; a TTL of 0 disables
+caching for that context.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Sequence
+import hashlib
+import json
+import logging
+
+import orjson
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from sqlalchemy import text
+
+from app.core.cache import ByteLRUCache
+from app.core.config import settings
+from app.core.db import async_session_factory
+from app.services.message_codec import decode_message, encode_message
+
+logger = logging.getLogger(__name__)
+
+# Per-occurrence fields that do not change what the model sees
+_OCCURRENCE_FIELDS = ("ts", "id")
+
+
+class LLMResponseCache:
+    """Two-tier cache of AI responses keyed by request content"""
+
+    def __init__(self, max_bytes: Optional[int] = None, use_db: Optional[bool] = None):
+        self.memory = ByteLRUCache(settings.LLM_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+        self.use_db = settings.LLM_CACHE_DB_ENABLED if use_db is None else use_db
+        self.hits = 0
+        self.misses = 0
+        self.db_hits = 0
+        self.db_errors = 0
+        self.db_writes = 0
+        self.db_purged = 0
+
+    @staticmethod
+    def ttl_for(context_type: Optional[str]) -> float:
+        return settings.LLM_CACHE_TTLS.get(context_type or "", settings.LLM_CACHE_TTL_DEFAULT)
+
+    @staticmethod
+    def make_key(
+        messages: Sequence[BaseMessage],
+        tools: Sequence[Any] = (),
+        model_params: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Stable hash of the request; the system prompt is the first message"""
+        payload = {
+            "messages": [
+                {k: v for k, v in encode_message(message).items() if k not in _OCCURRENCE_FIELDS}
+                for message in messages
+            ],
+            "tools": [convert_to_openai_tool(tool) for tool in tools],
+            "model": model_params or {},
+        }
+        encoded = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _freeze(message: BaseMessage) -> Dict[str, Any]:
+        return {k: v for k, v in encode_message(message).items() if k not in _OCCURRENCE_FIELDS}
+
+    @staticmethod
+    def _thaw(data: Dict[str, Any]) -> AIMessage:
+        # Decoded without an id or timestamp, so it is stored as a new message of this thread
+        return decode_message(data)
+
+    async def get(self, key: str, context_type: Optional[str] = None) -> Optional[AIMessage]:
+        if self.ttl_for(context_type) <= 0:
+            return None
+
+        data = self.memory.get(key)
+        if data is None and self.use_db:
+            data = await self._db_get(key)
+            if data is not None:
+                self.db_hits += 1
+                self.memory.set(key, data, ttl=self.ttl_for(context_type))
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._thaw(data)
+
+    async def set(self, key: str, message: BaseMessage, context_type: Optional[str] = None) -> None:
+        ttl = self.ttl_for(context_type)
+        if ttl <= 0:
+            return
+
+        data = self._freeze(message)
+        self.memory.set(key, data, ttl=ttl)
+        if self.use_db:
+            await self._db_set(key, data, context_type, ttl)
+
+    async def _db_get(self, key: str) -> Optional[Dict[str, Any]]:
+        query = text("""
+            SELECT response
+            FROM llm_response_cache
+            WHERE cache_key = :cache_key AND expires_at > NOW()
+        """)
+        try:
+            async with async_session_factory() as session:
+                return (await session.execute(query, {"cache_key": key})).scalar_one_or_none()
+        except Exception as e:
+            self.db_errors += 1
+            logger.error(f"Error reading LLM response cache: {e}")
+            return None
+
+    async def _db_set(self, key: str, data: Dict[str, Any], context_type: Optional[str], ttl: float) -> None:
+        query = text("""
+            INSERT INTO llm_response_cache (cache_key, response, context_type, expires_at)
+            VALUES (:cache_key, cast(:response as jsonb), :context_type, :expires_at)
+            ON CONFLICT (cache_key) DO UPDATE
+            SET response = EXCLUDED.response,
+                context_type = EXCLUDED.context_type,
+                expires_at = EXCLUDED.expires_at
+        """)
+        try:
+            async with async_session_factory() as session:
+                await session.execute(query, {
+                    "cache_key": key,
+                    "response": json.dumps(data),
+                    "context_type": context_type,
+                    "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)
+                })
+                self.db_writes += 1
+                if settings.LLM_CACHE_DB_PURGE_EVERY and self.db_writes % settings.LLM_CACHE_DB_PURGE_EVERY == 0:
+                    await self._db_purge(session)
+                await session.commit()
+        except Exception as e:
+            self.db_errors += 1
+            logger.error(f"Error writing LLM response cache: {e}")
+
+    async def _db_purge(self, session) -> None:
+        result = await session.execute(text("DELETE FROM llm_response_cache WHERE expires_at < NOW()"))
+        self.db_purged += result.rowcount
+        logger.info(f"Purged {result.rowcount} expired LLM response cache rows")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "db_enabled": self.use_db,
+            "db_hits": self.db_hits,
+            "db_writes": self.db_writes,
+            "db_purged": self.db_purged,
+            "db_errors": self.db_errors,
+        }
+
+
+llm_response_cache = LLMResponseCache()
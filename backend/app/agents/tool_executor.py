@@ -0,0 +1,75 @@
+"""
+/agents/tool_executor.py
+
+Runs the tool calls of one model turn concurrently.
+
+Async tools run on the event loop and sync-only tools in the shared thread
+pool (see core.concurrency). Every call has a timeout (TOOL_TIMEOUTS, falling
+back to TOOL_TIMEOUT_DEFAULT); a call that times out or fails becomes an error
+ToolMessage instead of failing the turn. Results come back in the order the
+model made the calls, so a turn takes as long as its slowest tool.
+
+Timed-out async tools are cancelled. A sync tool cannot be interrupted once it
+is running in a worker thread, so only its result is abandoned.
+"""
+from typing import Any, Dict, List, Sequence
+import asyncio
+import logging
+import time
+
+from langchain_core.messages import ToolMessage
+
+from app.core.concurrency import invoke_tool
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def tool_timeout(tool_name: str) -> float:
+    return settings.TOOL_TIMEOUTS.get(tool_name, settings.TOOL_TIMEOUT_DEFAULT)
+
+
+def tool_input(tool_call: Dict[str, Any]) -> Any:
+    """The single string argument our tools take (the first argument the model passed)"""
+    args = tool_call.get("args") or {}
+    for value in args.values():
+        if value:
+            return value
+    return "No arguments provided"
+
+
+async def run_tool_call(tool_call: Dict[str, Any], tools_by_name: Dict[str, Any]) -> ToolMessage:
+    tool_name = tool_call.get("name")
+    tool_id = tool_call.get("id", "unknown")
+    tool = tools_by_name.get(tool_name)
+    if tool is None:
+        return ToolMessage(content=f"Unknown tool: {tool_name}", tool_call_id=tool_id, status="error")
+
+    arg_value = tool_input(tool_call)
+    timeout = tool_timeout(tool_name)
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(invoke_tool(tool, arg_value), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Tool {tool_name} timed out after {timeout}s")
+        return ToolMessage(
+            content=f"Tool {tool_name} timed out after {timeout:g} seconds",
+            tool_call_id=tool_id,
+            status="error"
+        )
+    except Exception as e:
+        logger.error(f"Tool {tool_name} failed: {e}")
+        return ToolMessage(content=f"Tool {tool_name} failed: {e}", tool_call_id=tool_id, status="error")
+
+    logger.info(f"Tool {tool_name} completed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return ToolMessage(content=str(result), tool_call_id=tool_id)
+
+
+async def execute_tool_calls(
+    tool_calls: Sequence[Dict[str, Any]],
+    tools_by_name: Dict[str, Any]
+) -> List[ToolMessage]:
+    """Run all calls concurrently; the messages are in the original call order"""
+    return list(await asyncio.gather(
+        *(run_tool_call(tool_call, tools_by_name) for tool_call in tool_calls)
+    ))
@@ -12,34 +12,71 @@ The agent will be able to:
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic._migration")
 
-from langchain_core.messages import SystemMessage, AIMessage, ToolMessage
+from langchain_core.messages import SystemMessage, AIMessage, ToolMessage, HumanMessage, message_chunk_to_message
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.tools import Tool
-from app.tools import blog_writer
+from langchain_core.runnables import RunnableConfig
+from langgraph.constants import TAG_NOSTREAM
+from app.tools import blog_writer, research, video_processor, code_assistant
 from app.core.config import settings
+from app.core.concurrency import llm_slot
+from app.agents.context_window import ContextWindow, message_text
+from app.agents.llm_cache import LLMResponseCache, llm_response_cache
+from app.agents.tool_executor import execute_tool_calls
+from app.agents.batching import MicroBatcher, llm_batch_caller
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Set up Gemini for blog agent
+MODEL_PARAMS = {"model": "gemini-1.5-flash", "temperature": 0}
 llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    temperature=0,
+    **MODEL_PARAMS,
     google_api_key=settings.GOOGLE_API_KEY,
     convert_system_message_to_human=True,
-    streaming=False
+    streaming=True
 )
 
 # Set up tools
 tools = [
-    Tool(name="write_blog", func=blog_writer.blog_writer , description="Draft a blog")
+    Tool(name="research", func=research.research, description="Search the web for current information"),
+    Tool(name="write_blog", func=blog_writer.blog_writer , description="Draft a blog"),
+    Tool(name="analyze_video", func=video_processor.video_processor, description="Analyze or process video content"),
+    Tool(name="write_code", func=code_assistant.code_assistant, description="Write or debug code")
 ]
+tools_by_name = {tool.name: tool for tool in tools}
 
 # bind tools to llm
 llm_with_tools = llm.bind_tools(tools)
 
+# Non-streaming calls (from /chat/message) are micro-batched when enabled
+llm_batcher = MicroBatcher(llm_batch_caller(llm_with_tools))
+
 # For debugging tool calls
 print("Configured tools:", [tool.name for tool in tools])
 
+async def summarize_history(previous_summary: str, messages: list) -> str:
+    """
+    Fold messages that fell out of the context window into the rolling summary.
+    """
+    transcript = "\n".join(f"{message.type}: {message_text(message)}" for message in messages)
+    prompt = f"""
+    Update the running summary of a conversation between a user and Rebecca, an AI assistant.
+    Keep facts, decisions, user preferences and open tasks. Use at most 200 words.
+
+    Current summary:
+    {previous_summary or "(none)"}
+
+    New messages:
+    {transcript}
+    """
+    # Tagged so the summary is not streamed to the user as part of the answer
+    async with llm_slot():
+        result = await llm.ainvoke([HumanMessage(content=prompt)], config={"tags": [TAG_NOSTREAM]})
+    return result.content
+
 # Define the agent
-def unified_agent_node(state: dict) -> dict:
+async def unified_agent_node(state: dict, config: RunnableConfig) -> dict:
     """
     This is a unified agent that can be used to perform a variety of tasks.
     """
@@ -73,11 +110,45 @@ def unified_agent_node(state: dict) -> dict:
     
     Current context: {context.get('type')}, Task: {context.get('task')}
     """
-    full_messages = [SystemMessage(content=system_prompt)] + messages
+    
+    # Keep the newest turns within the token budget and summarize the rest
+    window = ContextWindow.for_context(context.get("type"), summarizer=summarize_history)
+    history, summary = await window.select(
+        messages,
+        summary=state.get("summary"),
+        reserved_tokens=window.counter(system_prompt)
+    )
+    if summary.get("text"):
+        system_prompt += f"""
+    Summary of the earlier conversation:
+    {summary['text']}
+    """
+    full_messages = [SystemMessage(content=system_prompt)] + history
     print(f"Invoking LLM with system prompt and {len(full_messages)} messages")
     
-    # Call the LLM (with tools bound)
-    result = llm_with_tools.invoke(full_messages)
+    # Identical requests (same prompt, history, tools and model) reuse a cached response,
+    # which the graph streams back as one message
+    cache_key = None
+    result = None
+    if config.get("configurable", {}).get("use_cache", True):
+        cache_key = LLMResponseCache.make_key(full_messages, tools, MODEL_PARAMS)
+        result = await llm_response_cache.get(cache_key, context.get("type"))
+        if result is not None:
+            logger.debug(f"LLM response served from cache ({context.get('type')})")
+    
+    if result is None:
+        if config.get("configurable", {}).get("batch", False):
+            result = await llm_batcher.submit(full_messages)
+        else:
+            # Stream the LLM (with tools bound); the graph's "messages" stream mode
+            # forwards each chunk to the client as it arrives
+            async with llm_slot():
+                async for chunk in llm_with_tools.astream(full_messages):
+                    result = chunk if result is None else result + chunk
+            result = message_chunk_to_message(result) if result is not None else AIMessage(content="")
+        # Only fresh responses are stored, so a hit never extends the entry's lifetime
+        if cache_key and (result.content or result.tool_calls):
+            await llm_response_cache.set(cache_key, result, context.get("type"))
     print(f"LLM Response type: {type(result)}, tool calls: {hasattr(result, 'tool_calls')}")
     
     # Handle tool calls
@@ -86,42 +157,18 @@ def unified_agent_node(state: dict) -> dict:
     if hasattr(result, 'tool_calls') and result.tool_calls:
         print(f"Tool calls made: {result.tool_calls}")
         
-        for tool_call in result.tool_calls:
-            tool_name = tool_call.get('name')
-            tool_args = tool_call.get('args', {})
-            tool_id = tool_call.get('id', 'unknown')
-            
-            # Extract the argument (different tools might use different arg names)
-            arg_value = None
-            for arg_key in tool_args:
-                arg_value = tool_args[arg_key]
-                break
-                
-            if not arg_value:
-                arg_value = "No arguments provided"
-                
-            print(f"Executing tool: {tool_name} with args: {arg_value}")
-            
-            # Call the appropriate tool function
-            if tool_name == 'write_blog':
-                tool_result = blog_writer.blog_writer(arg_value)
-            else:
-                tool_result = f"Unknown tool: {tool_name}"
-                
-            # Create a proper ToolMessage
-            response_messages.append(ToolMessage(
-                content=tool_result,
-                tool_call_id=tool_id
-            ))
+        # The AI message carrying the calls goes first: the model rejects tool results
+        # whose function call is missing from the history
+        response_messages.append(result)
         
-        # Also include the original AI message if it has content
-        if result.content and result.content.strip():
-            response_messages.append(result)
+        # Run every call of this turn concurrently; results keep the call order
+        response_messages.extend(await execute_tool_calls(result.tool_calls, tools_by_name))
     else:
         # If no tool calls, just add the AI response directly
         response_messages.append(result)
     
     return {
         "messages": response_messages, 
-        "context": context
+        "context": context,
+        "summary": summary
     }
@@ -1,10 +1,20 @@
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import StreamingResponse, JSONResponse
-from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.langgraph_chat_service import LangGraphChatService
-from app.services.thread_service import ThreadService
 from app.services.checkpoint_service import CheckpointService
-from app.core.db import get_db
+from app.services.stream_protocol import get_stream_encoder
+from app.services.stream_registry import stream_registry
+from app.core.config import settings
+from app.api.users import current_active_user, current_superuser
+from app.models.user import User
+from app.services.admission import chat_admission, AdmissionRejected
+from app.core.concurrency import llm_stats
+from app.agents.llm_cache import llm_response_cache
+from app.tools.cache import tool_cache_stats
+from app.services.thread_list_cache import thread_list_cache
+from app.services.activity_aggregator import thread_activity
+from app.graph.registry import graph_registry
+from app.agents.unified_agent import llm_batcher
 from typing import Dict, Any
 from app.schemas.checkpoint import CheckpointReset
 import json
@@ -12,14 +22,31 @@ import traceback
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+def admission_key(user: User) -> str:
+    """Fair-queuing key: one queue per user"""
+    return f"user:{user.id}"
+
+def too_many_requests(e: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(e)},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 @router.post("/stream")
-async def stream_chat(request: Request, db: AsyncSession = Depends(get_db)):
+async def stream_chat(
+    request: Request,
+    user: User = Depends(current_active_user)
+):
     """
     Stream chat responses from the AI model.
     
+    The request holds no DB session: the stream can run for many seconds, so
+    each DB operation of the turn uses its own short-lived session.
+    
     Args:
         request: FastAPI request object containing the user message and thread_id
-        db: Database session for thread management
+        user: The authenticated user; must own the thread
         
     Returns:
         StreamingResponse: Server-sent events stream of AI responses
@@ -30,6 +57,8 @@ async def stream_chat(request: Request, db: AsyncSession = Depends(get_db)):
         thread_id = body.get("thread_id")
         context_type = body.get("context_type", "general_chat")
         task_type = body.get("task_type")
+        # "no_cache": true forces a fresh LLM response
+        use_cache = not body.get("no_cache", False)
         
         if not user_message:
             return JSONResponse(
@@ -43,69 +72,91 @@ async def stream_chat(request: Request, db: AsyncSession = Depends(get_db)):
                 content={"error": "No thread_id provided"}
             )
 
-        # Update thread title if first message
-        thread_service = ThreadService(db)
-        await thread_service.update_thread_title_from_first_message(thread_id, user_message)
-        
-        # Initialize chat service with DB connection
-        chat_service = LangGraphChatService(db)
+        # A client reconnecting mid-answer resumes the running generation instead of starting another
+        # (only its own: buffers are handed out to the user who started them)
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id:
+            stream = stream_registry.get(thread_id, user.id)
+            if stream:
+                return StreamingResponse(
+                    stream.follow(last_event_id),
+                    media_type="text/event-stream"
+                )
+
+        # SSE event format; "v2" sends deltas with sequence ids (see stream_protocol)
+        try:
+            encoder = get_stream_encoder(body.get("protocol"))
+        except ValueError as e:
+            return JSONResponse(
+                status_code=400,
+                content={"error": str(e)}
+            )
+
+        # Wait for a generation slot; released when the generation ends, not when the client leaves
+        try:
+            admitted_at = await chat_admission.acquire(admission_key(user))
+        except AdmissionRejected as e:
+            return too_many_requests(e)
+
+        # Check the thread, set its title, record its activity and load its checkpoint in one query
+        chat_service = LangGraphChatService()
+        try:
+            turn = await chat_service.bootstrap_turn(thread_id, user_message, user.id)
+        except Exception:
+            chat_admission.release(admitted_at)
+            raise
+        if turn is None:
+            chat_admission.release(admitted_at)
+            return JSONResponse(
+                status_code=404,
+                content={"error": "Thread not found"}
+            )
 
         async def chat_stream():
             try:
-                current_content = ""
-                tool_outputs = []
-                
                 async for message_part in chat_service.stream_response(
                     message=user_message, 
                     thread_id=thread_id,
                     context_type=context_type,
-                    task_type=task_type
+                    task_type=task_type,
+                    use_cache=use_cache,
+                    bootstrapped=True
                 ):
                     message_type = message_part.get("type", "response")
                     content = message_part.get("content", "")
                     is_complete = message_part.get("complete", False)
-                    message_tool_outputs = message_part.get("tool_outputs", None)
-                    
-                    # For tool output messages, collect them to send as a separate response
+                
+                    # Send tool outputs immediately; they are also collected for the final event
                     if message_type == "tool_output":
                         print(f"Tool output received: {content[:100]}...")
-                        tool_outputs.append(content)
-                        # Send tool outputs immediately
-                        yield f"data: {json.dumps({'content': content, 'type': 'tool_output', 'complete': True})}\n\n"
-                    
+                        yield encoder.tool_output(content)
+                
                     # For complete messages (announcements, status updates), send them immediately
                     elif is_complete and message_type != "response":
-                        yield f"data: {json.dumps({'content': content, 'type': message_type, 'complete': True})}\n\n"
-                    
-                    # For streaming content of the main response, accumulate and send updates
+                        yield encoder.event(message_type, content)
+                
+                    # For streaming content of the main response, send updates
                     elif message_type == "response":
                         if content:
-                            current_content = content  # For streaming, we replace rather than append
-                            # Add tool outputs to the context for frontend processing
-                            payload = {
-                                'content': current_content, 
-                                'type': message_type, 
-                                'complete': False
-                            }
-                            yield f"data: {json.dumps(payload)}\n\n"
+                            frame = encoder.response(content, delta=message_part.get("delta", False))
+                            if frame:
+                                # v1 frames replace the previous one in the replay buffer
+                                yield frame, encoder.snapshots
                         elif is_complete:
                             # Empty content with response type signals completion
-                            # Include tool outputs as a separate field
-                            payload = {
-                                'content': current_content, 
-                                'type': message_type, 
-                                'complete': True,
-                                'tool_outputs': message_tool_outputs or tool_outputs
-                            }
-                            yield f"data: {json.dumps(payload)}\n\n"
-                    
+                            yield encoder.complete(message_part.get("tool_outputs")), encoder.snapshots
+                
             except Exception as e:
                 print(f"Error in chat_stream: {str(e)}")
                 traceback.print_exc()
-                yield f"data: {json.dumps({'content': f'Error: {str(e)}', 'type': 'error', 'complete': True})}\n\n"
+                yield encoder.error(f"Error: {str(e)}")
+            finally:
+                chat_admission.release(admitted_at)
 
+        # Run the generation in the background and follow its stream buffer
+        stream = stream_registry.start(thread_id, user.id, chat_stream())
         return StreamingResponse(
-            chat_stream(),
+            stream.follow(),
             media_type="text/event-stream"
         )
     except Exception as e:
@@ -116,14 +167,42 @@ async def stream_chat(request: Request, db: AsyncSession = Depends(get_db)):
             content={"error": str(e)}
         )
 
+@router.get("/stream/{thread_id}")
+async def resume_stream(
+    thread_id: str,
+    request: Request,
+    user: User = Depends(current_active_user)
+):
+    """
+    Resume the current or recently finished response stream of a thread.
+    
+    Args:
+        thread_id: Thread whose stream to follow
+        request: FastAPI request object; its Last-Event-ID header marks the last event received
+        user: The authenticated user; only streams they started can be resumed
+        
+    Returns:
+        StreamingResponse: The missed events, then the live events until the response completes
+    """
+    stream = stream_registry.get(thread_id, user.id)
+    if not stream:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "No active stream for this thread"}
+        )
+    
+    return StreamingResponse(
+        stream.follow(request.headers.get("last-event-id")),
+        media_type="text/event-stream"
+    )
+
 @router.post("/reset")
-async def reset_memory(request: Request, db: AsyncSession = Depends(get_db)) -> Dict[str, str]:
+async def reset_memory(request: Request) -> Dict[str, str]:
     """
     Reset the conversation memory for a specific thread.
     
     Args:
         request: FastAPI request object containing the thread_id
-        db: Database session for thread management
         
     Returns:
         Dict[str, str]: Status message
@@ -138,7 +217,7 @@ async def reset_memory(request: Request, db: AsyncSession = Depends(get_db)) ->
                 content={"error": "No thread_id provided"}
             )
         
-        chat_service = LangGraphChatService(db)
+        chat_service = LangGraphChatService()
         success = await chat_service.reset_thread(thread_id)
         
         if success:
@@ -157,13 +236,16 @@ async def reset_memory(request: Request, db: AsyncSession = Depends(get_db)) ->
         )
 
 @router.post("/message")
-async def send_message(request: Request, db: AsyncSession = Depends(get_db)):
+async def send_message(
+    request: Request,
+    user: User = Depends(current_active_user)
+):
     """
     Send a chat message without streaming for simple thread history population.
     
     Args:
         request: FastAPI request object containing the user message and thread_id
-        db: Database session for thread management
+        user: The authenticated user; must own the thread
         
     Returns:
         JSON response with the AI's message
@@ -174,6 +256,8 @@ async def send_message(request: Request, db: AsyncSession = Depends(get_db)):
         thread_id = body.get("thread_id")
         context_type = body.get("context_type", "general_chat")
         task_type = body.get("task_type")
+        # "no_cache": true forces a fresh LLM response
+        use_cache = not body.get("no_cache", False)
         
         if not user_message:
             return JSONResponse(
@@ -187,37 +271,53 @@ async def send_message(request: Request, db: AsyncSession = Depends(get_db)):
                 content={"error": "No thread_id provided"}
             )
 
-        # Update thread title if first message
-        thread_service = ThreadService(db)
-        await thread_service.update_thread_title_from_first_message(thread_id, user_message)
-        
-        # Initialize chat service with DB connection
-        chat_service = LangGraphChatService(db)
+        # The chat service opens short-lived sessions around each DB operation
+        chat_service = LangGraphChatService()
         
-        # Process message synchronously
-        responses = []
-        tool_outputs = []
-        
-        # Create a simple processor for the stream
-        async for message_part in chat_service.stream_response(
-            message=user_message, 
-            thread_id=thread_id,
-            context_type=context_type,
-            task_type=task_type
-        ):
-            message_type = message_part.get("type", "response")
-            content = message_part.get("content", "")
-            is_complete = message_part.get("complete", False)
-            message_tool_outputs = message_part.get("tool_outputs", None)
-            
-            if message_type == "tool_output" and content:
-                tool_outputs.append(content)
-            
-            if message_type == "response" and is_complete and message_tool_outputs:
-                tool_outputs.extend(message_tool_outputs or [])
-            
-            if message_type == "response" and content:
-                responses.append(content)
+        # Process message synchronously, once admitted; a rejected request leaves the thread untouched
+        try:
+            async with chat_admission.admit(admission_key(user)):
+                # Check the thread, set its title, record its activity and load its checkpoint in one query
+                turn = await chat_service.bootstrap_turn(thread_id, user_message, user.id)
+                if turn is None:
+                    return JSONResponse(
+                        status_code=404,
+                        content={"error": "Thread not found"}
+                    )
+                
+                responses = []
+                tool_outputs = []
+
+                # Create a simple processor for the stream
+                async for message_part in chat_service.stream_response(
+                    message=user_message, 
+                    thread_id=thread_id,
+                    context_type=context_type,
+                    task_type=task_type,
+                    use_cache=use_cache,
+                    batch=settings.LLM_BATCHING_ENABLED,
+                    bootstrapped=True
+                ):
+                    message_type = message_part.get("type", "response")
+                    content = message_part.get("content", "")
+                    is_complete = message_part.get("complete", False)
+                    message_tool_outputs = message_part.get("tool_outputs", None)
+
+                    if message_type == "tool_output" and content:
+                        tool_outputs.append(content)
+
+                    if message_type == "response" and is_complete and message_tool_outputs:
+                        tool_outputs.extend(message_tool_outputs or [])
+
+                    if message_type == "response" and content:
+                        if message_part.get("delta") and responses:
+                            # Token chunks continue the current response
+                            responses[-1] += content
+                        else:
+                            responses.append(content)
+
+        except AdmissionRejected as e:
+            return too_many_requests(e)
         
         # Return the final response
         return {
@@ -233,4 +333,44 @@ async def send_message(request: Request, db: AsyncSession = Depends(get_db)):
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
-        ) 
\ No newline at end of file
+        ) 
+
+@router.get("/cache")
+async def llm_cache_stats(user: User = Depends(current_superuser)) -> Dict[str, Any]:
+    """
+    LLM response, tool result and thread list cache statistics (superusers only).
+    """
+    return {
+        "llm": llm_response_cache.stats(),
+        "tools": tool_cache_stats(),
+        "thread_lists": thread_list_cache.stats()
+    }
+
+@router.get("/admission")
+async def admission_stats(user: User = Depends(current_superuser)) -> Dict[str, Any]:
+    """
+    Chat admission queue, LLM concurrency and write-behind metrics (superusers only).
+    """
+    return {
+        "admission": chat_admission.stats(),
+        "llm": llm_stats(),
+        "batching": llm_batcher.stats(),
+        "streams": stream_registry.stats(),
+        "thread_activity": thread_activity.stats()
+    }
+
+
+@router.get("/graphs")
+async def graph_stats(user: User = Depends(current_superuser)) -> Dict[str, Any]:
+    """
+    Compiled graph variants and their compile times (superusers only).
+    """
+    return graph_registry.stats()
+
+@router.post("/graphs/reload")
+async def reload_graphs(user: User = Depends(current_superuser)) -> Dict[str, Any]:
+    """
+    Recompile all graphs and swap them in atomically (superusers only).
+    """
+    graph_registry.reload()
+    return graph_registry.stats()
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.db import get_db
-from app.api.users import current_active_user
+from app.api.users import current_active_user, current_superuser
 from app.models.user import User
 from app.services.checkpoint_service import CheckpointService
 from app.services.thread_service import ThreadService
-from app.schemas.checkpoint import CheckpointReset
-from typing import Dict, Any
+from app.schemas.checkpoint import CheckpointReset, CheckpointRollback, CheckpointVersion
+from app.core.config import settings
+from typing import Dict, Any, List
 import json
 
 router = APIRouter(prefix="/checkpoints", tags=["checkpoints"])
@@ -60,4 +61,72 @@ async def reset_checkpoint(
         raise HTTPException(
             status_code=500,
             detail="Failed to reset checkpoint"
-        ) 
\ No newline at end of file
+        )
+
+@router.get("/{thread_id}/history", response_model=List[CheckpointVersion])
+async def get_checkpoint_history(
+    thread_id: str,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(current_active_user)
+):
+    """
+    List the saved checkpoint versions of a thread, newest first
+    """
+    thread_service = ThreadService(db)
+    threads = await thread_service.get_threads_for_user(
+        user_id=user.id,
+        thread_id=thread_id,
+        include_archived=True
+    )
+    
+    if not threads:
+        raise HTTPException(
+            status_code=404,
+            detail="Thread not found or doesn't belong to user"
+        )
+    
+    checkpoint_service = CheckpointService(db)
+    return await checkpoint_service.history.list_versions(thread_id)
+
+@router.post("/rollback")
+async def rollback_checkpoint(
+    data: CheckpointRollback,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(current_active_user)
+):
+    """
+    Restore a thread's checkpoint to a previous version
+    """
+    if not settings.CHECKPOINT_HISTORY_ENABLED:
+        raise HTTPException(status_code=400, detail="Checkpoint history is not enabled")
+    
+    # First, verify thread belongs to user
+    thread_service = ThreadService(db)
+    threads = await thread_service.get_threads_for_user(
+        user_id=user.id,
+        thread_id=data.thread_id
+    )
+    
+    if not threads:
+        raise HTTPException(
+            status_code=404,
+            detail="Thread not found or doesn't belong to user"
+        )
+    
+    checkpoint_service = CheckpointService(db)
+    success = await checkpoint_service.rollback_to_version(data.thread_id, data.version)
+    
+    if success:
+        return {"status": "success", "message": f"Thread '{data.thread_id}' rolled back to version {data.version}"}
+    else:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Checkpoint version {data.version} not found"
+        )
+
+@router.get("/cache")
+async def get_checkpoint_cache_stats(user: User = Depends(current_superuser)):
+    """
+    Report hit/miss/eviction counters of the in-process checkpoint cache
+    """
+    return CheckpointService.cache_stats()
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.db import get_db
 from app.api.users import current_active_user
 from app.models.user import User
 from app.models.thread import Thread
 from app.services.thread_service import ThreadService
+from app.services.thread_list_cache import thread_list_cache
 from app.services.checkpoint_service import CheckpointService
+from app.services.message_codec import to_api_dict
 from app.schemas.thread import ThreadCreate, ThreadResponse, ThreadMessagesResponse
 from typing import List, Dict, Any, Optional
 import json
 import logging
+
+import orjson
 from datetime import datetime
 
 router = APIRouter(prefix="/threads", tags=["threads"])
@@ -65,31 +69,80 @@ async def create_thread(
 
 @router.get("", response_model=List[ThreadResponse])
 async def get_threads(
+    request: Request,
     include_archived: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(current_active_user)
 ):
+    """
+    List the user's threads, most recently active first
+    
+    Without `limit` every thread is returned. With `limit`, one page is returned
+    and, if there are more threads, the `X-Next-Cursor` response header holds
+    the cursor to pass back as `cursor` for the next page.
+    
+    Responses carry a strong ETag; a request whose If-None-Match matches the
+    current list gets a 304. Unchanged lists are served from an in-process
+    cache without touching the database.
+    """
     # Ensure user is fully loaded before accessing attributes
     user_id = user.id if user else None
     
     if not user_id:
         raise HTTPException(status_code=401, detail="User authentication required")
     
-    thread_service = ThreadService(db)
-    threads = await thread_service.get_threads_for_user(
-        user_id=user_id,
-        include_archived=include_archived
-    )
-    return threads
+    params = (include_archived, limit, cursor)
+    if_none_match = request.headers.get("if-none-match")
+    
+    cached = thread_list_cache.get(user_id, params)
+    if cached:
+        etag, body, headers = cached
+    else:
+        thread_service = ThreadService(db)
+        try:
+            after = thread_service.decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Read the version before the query, so a change committed meanwhile invalidates this entry
+        version = thread_list_cache.version(user_id)
+        threads = await thread_service.get_threads_for_user(
+            user_id=user_id,
+            include_archived=include_archived,
+            # One extra row tells us whether there is a next page
+            limit=limit + 1 if limit else None,
+            after=after
+        )
+        
+        headers = {}
+        if limit and len(threads) > limit:
+            threads = threads[:limit]
+            headers["X-Next-Cursor"] = thread_service.encode_cursor(threads[-1])
+        
+        body = orjson.dumps([ThreadResponse.model_validate(thread).model_dump(mode="json") for thread in threads])
+        etag = thread_list_cache.set(user_id, params, version, body, headers)
+    
+    headers = {**headers, "ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/{thread_id}/messages", response_model=ThreadMessagesResponse)
 async def get_thread_messages(
     thread_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    before: Optional[int] = Query(None, ge=0),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(current_active_user)
 ):
     """
     Get messages for a thread
+    
+    Without `limit` the whole history is returned. With `limit`, the newest
+    `limit` messages are returned together with `next_cursor`; pass it back as
+    `before` to fetch the next older page.
     """
     logger = logging.getLogger(__name__)
     logger.info(f"Retrieving messages for thread {thread_id}")
@@ -111,75 +164,35 @@ async def get_thread_messages(
     # Retrieve messages from thread
     try:
         checkpoint_service = CheckpointService(db)
-        checkpoint = await checkpoint_service.get_latest_checkpoint_for_thread(thread_id)
+        messages_data, next_cursor, total = await checkpoint_service.get_message_page(
+            thread_id,
+            limit=limit,
+            before=before
+        )
         
-        if not checkpoint:
-            logger.warning(f"No checkpoint found for thread {thread_id}")
+        if not total:
+            logger.warning(f"No messages found for thread {thread_id}")
             return ThreadMessagesResponse(thread_id=thread_id, messages=[])
         
-        messages_data = checkpoint.get("messages", [])
-        logger.debug(f"Retrieved {len(messages_data)} raw messages")
+        logger.debug(f"Retrieved {len(messages_data)} of {total} raw messages")
         
-        # Process and format messages
+        # Decode each stored message into its API form in a single pass
         formatted_messages = []
         for message in messages_data:
             try:
-                # Extract message type/role - handle different message formats
-                message_type = None
-                content = None
-                
-                # Try to determine message type
-                if isinstance(message, dict):
-                    # Direct dictionary format
-                    if "type" in message:
-                        message_type = message.get("type")
-                    elif "role" in message:
-                        message_type = message.get("role")
-                        
-                    # LangChain format
-                    if message_type == "human":
-                        message_type = "user"
-                    elif message_type == "ai":
-                        message_type = "assistant"
-                        
-                    # Extract content based on format
-                    if "content" in message:
-                        content = message.get("content")
-                    elif "text" in message:
-                        content = message.get("text")
-                    elif "body" in message:
-                        content = message.get("body")
-                        
-                # Handle string content (convert to user message)
-                elif isinstance(message, str):
-                    message_type = "user"
-                    content = message
-                
-                # Skip messages with no content or unknown type
-                if content is None:
-                    logger.warning(f"Could not extract content from message: {message}")
-                    continue
-                    
-                if message_type is None:
-                    logger.warning(f"Could not determine message type: {message}")
-                    message_type = "unknown"
-                
-                # Create formatted message
-                formatted_message = {
-                    "role": message_type,
-                    "content": content,
-                    "created_at": datetime.now().isoformat()
-                }
-                
-                formatted_messages.append(formatted_message)
-                
+                formatted_messages.append(to_api_dict(message))
             except Exception as e:
                 logger.error(f"Error processing message: {e}")
                 # Continue processing other messages
                 continue
         
         logger.info(f"Successfully processed {len(formatted_messages)} messages")
-        return ThreadMessagesResponse(thread_id=thread_id, messages=formatted_messages)
+        return ThreadMessagesResponse(
+            thread_id=thread_id,
+            messages=formatted_messages,
+            next_cursor=next_cursor,
+            total=total
+        )
         
     except Exception as e:
         logger.error(f"Error retrieving messages for thread {thread_id}: {e}")
@@ -0,0 +1,84 @@
+"""
+/app/core/concurrency.py
+Concurrency limits for outbound LLM calls and blocking tool code.
+
+LLM calls are awaited on the event loop but capped process-wide by a
+semaphore, so a burst of chats cannot open unbounded upstream requests.
+Synchronous code (tools without an async implementation) runs in a bounded
+thread pool instead of blocking the event loop.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional, TypeVar
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+_llm_stats = {"in_flight": 0, "waiting": 0, "calls": 0, "wait_seconds": 0.0}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.TOOL_THREAD_POOL_SIZE,
+    thread_name_prefix="sync-tool"
+)
+
+
+def _semaphore() -> asyncio.Semaphore:
+    # Created lazily so it binds to the running event loop
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Hold one of the LLM_MAX_CONCURRENCY outbound LLM call slots"""
+    semaphore = _semaphore()
+    started = time.perf_counter()
+    _llm_stats["waiting"] += 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _llm_stats["waiting"] -= 1
+
+    waited = time.perf_counter() - started
+    _llm_stats["calls"] += 1
+    _llm_stats["wait_seconds"] += waited
+    _llm_stats["in_flight"] += 1
+    if waited > 1.0:
+        logger.info(f"Waited {waited:.2f}s for an LLM slot")
+    try:
+        yield
+    finally:
+        _llm_stats["in_flight"] -= 1
+        semaphore.release()
+
+
+def llm_stats() -> Dict[str, Any]:
+    return {"max_concurrency": settings.LLM_MAX_CONCURRENCY, **_llm_stats}
+
+
+async def run_sync(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run blocking code in the shared thread pool, keeping context variables"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+async def invoke_tool(tool: Any, tool_input: Any) -> Any:
+    """Invoke a LangChain tool natively if it is async, otherwise in the thread pool"""
+    if getattr(tool, "coroutine", None) is not None:
+        return await tool.ainvoke(tool_input)
+    if hasattr(tool, "invoke"):
+        return await run_sync(tool.invoke, tool_input)
+    return await run_sync(tool, tool_input)
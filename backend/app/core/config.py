@@ -3,7 +3,7 @@
 Application configuration settings.
 """ 
 
-from typing import List, Union, Optional
+from typing import Dict, List, Union, Optional
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -38,7 +38,108 @@ class Settings(BaseSettings):
     
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
-    
+
+    # Checkpoint storage
+    # "full" rewrites the whole state on every save, "delta" appends only new messages
+    CHECKPOINT_STORAGE_MODE: str = "full"
+    # Number of delta rows a thread may accumulate before they are compacted into a snapshot
+    CHECKPOINT_COMPACTION_INTERVAL: int = 20
+    # Seconds between intermediate checkpoint flushes during a turn (0 = flush only at the end)
+    CHECKPOINT_FLUSH_INTERVAL: float = 5.0
+    # Codec for stored state: "json" (JSONB column), "orjson", "msgpack" or "msgpack_zstd"
+    CHECKPOINT_CODEC: str = "json"
+    CHECKPOINT_ZSTD_LEVEL: int = 3
+    # Optional zstd dictionary trained with checkpoint_codec.train_zstd_dictionary
+    CHECKPOINT_ZSTD_DICT_PATH: Optional[str] = None
+    # In-process cache of decoded checkpoint states (0 bytes disables it)
+    CHECKPOINT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CHECKPOINT_CACHE_TTL: float = 300.0
+    # Keep every saved checkpoint as a version (messages are stored once by content hash)
+    CHECKPOINT_HISTORY_ENABLED: bool = False
+
+    # Rendered GET /threads responses, per user (0 bytes disables the cache)
+    THREAD_LIST_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    # Bounds how long a change made through another worker process can go unnoticed
+    THREAD_LIST_CACHE_TTL: float = 30.0
+
+    # threads.last_activity_at is written behind: at most once per thread per interval (seconds)
+    THREAD_ACTIVITY_FLUSH_INTERVAL: float = 5.0
+    # Threads per batched UPDATE statement
+    THREAD_ACTIVITY_FLUSH_BATCH: int = 500
+
+    # Agent context window
+    # Token budget for the history sent to the model, per thread context_type
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {
+        "general_chat": 8000,
+        "research": 16000,
+        "blog_creation": 16000,
+        "code_writing": 16000,
+        "video_processing": 32000,
+    }
+    CONTEXT_TOKEN_BUDGET_DEFAULT: int = 8000
+    # tiktoken encoding used to approximate token counts
+    CONTEXT_TOKENIZER: str = "cl100k_base"
+    # Number of distinct message texts whose token counts are memoized
+    CONTEXT_TOKEN_CACHE_SIZE: int = 8192
+
+    # LLM response cache
+    # Seconds a response stays cached, per thread context_type (0 = never cache)
+    LLM_CACHE_TTLS: Dict[str, float] = {
+        "general_chat": 3600.0,
+        "research": 900.0,
+        "blog_creation": 86400.0,
+        "code_writing": 86400.0,
+        "video_processing": 86400.0,
+    }
+    LLM_CACHE_TTL_DEFAULT: float = 3600.0
+    # In-process tier size (0 bytes disables it)
+    LLM_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # Also share responses through the llm_response_cache table
+    LLM_CACHE_DB_ENABLED: bool = False
+    # Delete expired llm_response_cache rows once every this many writes
+    LLM_CACHE_DB_PURGE_EVERY: int = 200
+
+    # Concurrency
+    # Outbound LLM calls allowed at once per process
+    LLM_MAX_CONCURRENCY: int = 8
+    # Threads for tools that only have a synchronous implementation
+    TOOL_THREAD_POOL_SIZE: int = 8
+    # Seconds a single tool call may run, per tool name
+    TOOL_TIMEOUTS: Dict[str, float] = {
+        "research": 20.0,
+        "write_blog": 60.0,
+        "analyze_video": 120.0,
+        "write_code": 60.0,
+    }
+    TOOL_TIMEOUT_DEFAULT: float = 30.0
+    # Memoized tool results, shared by all tools (0 bytes disables the cache)
+    TOOL_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    # Per-tool TTL overrides in seconds for @cached_tool (0 = no caching)
+    TOOL_CACHE_TTLS: Dict[str, float] = {}
+
+    # Micro-batching of non-streaming /chat/message LLM calls
+    LLM_BATCHING_ENABLED: bool = False
+    LLM_BATCH_MAX_SIZE: int = 8
+    # How long the first call of a batch waits for others to join
+    LLM_BATCH_MAX_WAIT_MS: int = 20
+    # LLM slots a single batch may hold at once (each item is its own upstream request)
+    LLM_BATCH_MAX_CONCURRENCY: int = 4
+
+    # Chat admission control
+    # Generations running at once per process; further requests queue fairly per user
+    CHAT_MAX_IN_FLIGHT: int = 16
+    # Seconds a request may wait in the queue before it is rejected with 429
+    CHAT_QUEUE_TIMEOUT: float = 10.0
+
+    # Chat streaming
+    # Number of v2 delta events between full-content keyframes (0 = keyframes only on whole messages)
+    STREAM_KEYFRAME_INTERVAL: int = 50
+    # Events kept per thread for Last-Event-ID replay, and how long a finished stream stays resumable
+    STREAM_BUFFER_MAX_EVENTS: int = 2048
+    STREAM_BUFFER_TTL: float = 300.0
+    # Byte budget per stream buffer; the oldest frames are dropped beyond it
+    STREAM_BUFFER_MAX_BYTES: int = 1024 * 1024
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 
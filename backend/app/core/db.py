@@ -6,6 +6,7 @@ Database connection and configuration.
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy import text
+from contextlib import asynccontextmanager
 
 from app.core.config import settings
 
@@ -53,6 +54,23 @@ async def get_db():
         finally:
             await session.close()
 
+@asynccontextmanager
+async def session_scope():
+    """
+    Short-lived session for one unit of work, committed on success.
+
+    Use this instead of a request-scoped session in code that outlives a
+    quick query (e.g. a streaming chat turn), so a pooled connection is only
+    checked out while the statements actually run.
+    """
+    async with async_session_factory() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
 async def test_db_connection():
     """Simple test to verify database connectivity."""
     try:
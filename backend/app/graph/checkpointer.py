@@ -0,0 +1,269 @@
+"""
+/app/graph/checkpointer.py
+
+LangGraph checkpointer backed by our langgraph_checkpoints table.
+
+The saver stores a LangGraph checkpoint as the thread's regular checkpoint
+state, so everything built on CheckpointService (codecs, delta log, hot cache,
+history, the threads API) keeps working:
+
+    {
+        "messages": [...],            # encoded by the message codec
+        "context": {...},
+        "task_flags": {...},
+        "summary": {...},
+        "__lg__": {                   # LangGraph bookkeeping
+            "v", "id", "ts", "parent_id", "channel_versions", "versions_seen",
+            "metadata", "channels", "pending_sends", "pending_writes"
+        }
+    }
+
+Puts are staged in a per-thread write-behind buffer and written once per turn
+by `aflush` (or every CHECKPOINT_FLUSH_INTERVAL seconds), and each database
+operation uses its own short-lived session.
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import base64
+import logging
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    empty_checkpoint,
+    get_checkpoint_id,
+)
+
+from app.core.db import async_session_factory
+from app.services.checkpoint_buffer import CheckpointBuffer
+from app.services.checkpoint_service import CheckpointService
+from app.services.message_codec import decode_message, stamp_message
+
+logger = logging.getLogger(__name__)
+
+LG_KEY = "__lg__"
+# Graph state channels stored as plain checkpoint keys; every other channel is serde-encoded
+STATE_CHANNELS = ("messages", "context", "task_flags", "summary")
+
+
+class PostgresCheckpointSaver(BaseCheckpointSaver):
+    """Async LangGraph checkpointer on top of CheckpointService."""
+
+    def __init__(self, session_factory=async_session_factory, serde=None):
+        super().__init__(serde=serde)
+        self.session_factory = session_factory
+        self._buffers: Dict[str, CheckpointBuffer] = {}
+        # Pending writes of the latest checkpoint per thread: (checkpoint_id, [(task_id, channel, value)])
+        self._writes: Dict[str, Tuple[str, List[Tuple[str, str, Any]]]] = {}
+        self._lock = asyncio.Lock()
+
+    # Encoding ------------------------------------------------------------------
+
+    def _dump(self, value: Any) -> List[str]:
+        type_, data = self.serde.dumps_typed(value)
+        return [type_, base64.b64encode(data).decode("ascii")]
+
+    def _load(self, dumped: List[str]) -> Any:
+        type_, data = dumped
+        return self.serde.loads_typed((type_, base64.b64decode(data)))
+
+    def _to_state(
+        self,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        parent_id: Optional[str]
+    ) -> Dict[str, Any]:
+        values = checkpoint.get("channel_values", {})
+        state = {key: values[key] for key in STATE_CHANNELS if key in values}
+        # New messages get their timestamp here, once, so every later encoding agrees
+        for message in state.get("messages", []):
+            if isinstance(message, BaseMessage):
+                stamp_message(message)
+        # Node outputs in metadata duplicate the messages already in the state
+        metadata = {key: value for key, value in (metadata or {}).items() if key != "writes"}
+        state[LG_KEY] = {
+            "v": checkpoint["v"],
+            "id": checkpoint["id"],
+            "ts": checkpoint["ts"],
+            "parent_id": parent_id,
+            "channel_versions": checkpoint["channel_versions"],
+            "versions_seen": checkpoint["versions_seen"],
+            "metadata": self._dump(metadata),
+            "channels": {
+                key: self._dump(value) for key, value in values.items() if key not in STATE_CHANNELS
+            },
+            "pending_sends": self._dump(checkpoint.get("pending_sends") or []),
+        }
+        return state
+
+    def _to_tuple(self, thread_id: str, state: Dict[str, Any]) -> CheckpointTuple:
+        values: Dict[str, Any] = {}
+        for key in STATE_CHANNELS:
+            if key in state:
+                values[key] = state[key]
+        if "messages" in values:
+            # Staged states still hold message objects; stored ones hold encoded dicts
+            values["messages"] = [
+                m if isinstance(m, BaseMessage) else decode_message(m) for m in values["messages"]
+            ]
+
+        lg = state.get(LG_KEY)
+        if lg is None:
+            # Written before the checkpointer existed (or by initialize_empty_checkpoint)
+            checkpoint = empty_checkpoint()
+            checkpoint["channel_values"] = values
+            checkpoint["channel_versions"] = {key: 1 for key in values}
+            metadata: CheckpointMetadata = {"source": "input", "step": -1, "parents": {}}
+            parent_id = None
+        else:
+            values.update({key: self._load(value) for key, value in lg.get("channels", {}).items()})
+            checkpoint = {
+                "v": lg["v"],
+                "id": lg["id"],
+                "ts": lg["ts"],
+                "channel_values": values,
+                "channel_versions": lg.get("channel_versions", {}),
+                "versions_seen": lg.get("versions_seen", {}),
+                "pending_sends": self._load(lg["pending_sends"]) if lg.get("pending_sends") else [],
+            }
+            metadata = self._load(lg["metadata"]) if lg.get("metadata") else {}
+            parent_id = lg.get("parent_id")
+
+        pending_writes = None
+        checkpoint_id, writes = self._writes.get(thread_id, (None, []))
+        if checkpoint_id == checkpoint["id"]:
+            pending_writes = list(writes)
+        elif lg and lg.get("pending_writes"):
+            pending_writes = [
+                (task_id, channel, self._load(value)) for task_id, channel, value in lg["pending_writes"]
+            ]
+
+        return CheckpointTuple(
+            config=self._config(thread_id, checkpoint["id"]),
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=self._config(thread_id, parent_id) if parent_id else None,
+            pending_writes=pending_writes,
+        )
+
+    @staticmethod
+    def _config(thread_id: str, checkpoint_id: str) -> RunnableConfig:
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": checkpoint_id}}
+
+    # Persistence ---------------------------------------------------------------
+
+    async def _save(self, thread_id: str, state: Dict[str, Any]) -> bool:
+        checkpoint_id, writes = self._writes.get(thread_id, (None, []))
+        if writes and state[LG_KEY]["id"] == checkpoint_id:
+            state = dict(state)
+            state[LG_KEY] = dict(state[LG_KEY])
+            state[LG_KEY]["pending_writes"] = [
+                [task_id, channel, self._dump(value)] for task_id, channel, value in writes
+            ]
+
+        async with self.session_factory() as session:
+            return await CheckpointService(session).save_checkpoint({"thread_id": thread_id}, state)
+
+    async def _buffer(self, thread_id: str) -> CheckpointBuffer:
+        async with self._lock:
+            buffer = self._buffers.get(thread_id)
+            if buffer is None:
+                buffer = CheckpointBuffer(lambda state: self._save(thread_id, state), thread_id)
+                self._buffers[thread_id] = buffer
+            return buffer
+
+    async def aflush(self, thread_id: str) -> bool:
+        """Write the thread's staged checkpoint, if any. Call at the end of every run."""
+        async with self._lock:
+            buffer = self._buffers.pop(thread_id, None)
+        try:
+            return await buffer.flush() if buffer else True
+        finally:
+            # Pending writes were persisted with the checkpoint they belong to
+            self._writes.pop(thread_id, None)
+
+    def discard(self, thread_id: str) -> None:
+        """Forget staged state for a thread whose checkpoint was deleted."""
+        self._buffers.pop(thread_id, None)
+        self._writes.pop(thread_id, None)
+
+    # BaseCheckpointSaver API -----------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_id = get_checkpoint_id(config)
+
+        buffer = self._buffers.get(thread_id)
+        state = buffer.pending if buffer else None
+        if state is None:
+            async with self.session_factory() as session:
+                state = await CheckpointService(session).get_checkpoint({"thread_id": thread_id})
+        if not state:
+            return None
+
+        checkpoint_tuple = self._to_tuple(thread_id, state)
+        if checkpoint_id and checkpoint_tuple.checkpoint["id"] != checkpoint_id:
+            # Only the latest checkpoint is addressable; older ones live in the checkpoint history
+            return None
+        return checkpoint_tuple
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if not config or limit == 0:
+            return
+        checkpoint_tuple = await self.aget_tuple(config)
+        if checkpoint_tuple is None:
+            return
+        if before and checkpoint_tuple.checkpoint["id"] >= get_checkpoint_id(before):
+            return
+        if filter and any(checkpoint_tuple.metadata.get(k) != v for k, v in filter.items()):
+            return
+        yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        parent_id = config["configurable"].get("checkpoint_id")
+
+        buffer = await self._buffer(thread_id)
+        await buffer.stage(self._to_state(checkpoint, metadata, parent_id))
+        return self._config(thread_id, checkpoint["id"])
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        # Writes belong to the latest checkpoint; they are persisted with it on flush
+        current_id, current = self._writes.get(thread_id, (None, []))
+        if current_id != checkpoint_id:
+            current = []
+        current = [w for w in current if w[0] != task_id] + [
+            (task_id, channel, value) for channel, value in writes
+        ]
+        self._writes[thread_id] = (checkpoint_id, current)
+
+
+# Shared by every compiled graph in this process
+postgres_checkpointer = PostgresCheckpointSaver()
@@ -0,0 +1,136 @@
+"""
+/app/graph/registry.py
+
+Compile-once registry of the chat graphs.
+
+Compiled graphs are immutable and safe to share between requests, so each
+variant is compiled once at startup and handed out from here instead of being
+rebuilt per request. Variants are keyed by (context_type, task_type) and by
+checkpointer; a lookup falls back from the exact variant to the context_type
+variant to the default graph. Only the default graph is ever compiled on
+demand (when nothing was compiled at startup, e.g. in scripts): task_type
+comes from the request body, so compiling whatever key is asked for would let
+clients grow the registry without bound.
+
+`reload()` compiles a complete new set of graphs and then swaps it in with a
+single assignment, so requests see either the old set or the new one, never a
+mix.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import threading
+import time
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.core.config import settings
+from app.graph.checkpointer import postgres_checkpointer
+from app.graph.unified_graph import get_graph
+
+logger = logging.getLogger(__name__)
+
+# Keeps thread state across requests when the chat service runs without a database
+memory_checkpointer = MemorySaver()
+
+CHECKPOINTERS = {
+    "postgres": postgres_checkpointer,
+    "memory": memory_checkpointer,
+}
+
+GraphKey = Tuple[Optional[str], Optional[str], str]
+
+
+class GraphRegistry:
+    """Shared compiled graphs per context_type/task_type and checkpointer"""
+
+    def __init__(self):
+        self._graphs: Dict[GraphKey, Any] = {}
+        self._compile_ms: Dict[GraphKey, float] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    @staticmethod
+    def default_variants() -> List[Tuple[Optional[str], Optional[str]]]:
+        """The default graph plus one per configured context_type"""
+        return [(None, None)] + [(context_type, None) for context_type in settings.CONTEXT_TOKEN_BUDGETS]
+
+    @staticmethod
+    def _compile(key: GraphKey) -> Tuple[Any, float]:
+        context_type, task_type, checkpointer = key
+        started = time.perf_counter()
+        graph = get_graph(checkpointer=CHECKPOINTERS[checkpointer])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"Compiled graph context_type={context_type} task_type={task_type} "
+            f"checkpointer={checkpointer} in {elapsed_ms:.1f} ms"
+        )
+        return graph, elapsed_ms
+
+    def _build(self, variants: Iterable[Tuple[Optional[str], Optional[str]]]) -> Tuple[Dict, Dict]:
+        graphs, timings = {}, {}
+        for context_type, task_type in variants:
+            for checkpointer in CHECKPOINTERS:
+                key = (context_type, task_type, checkpointer)
+                graphs[key], timings[key] = self._compile(key)
+        return graphs, timings
+
+    def compile_all(self, variants: Optional[Iterable[Tuple[Optional[str], Optional[str]]]] = None) -> None:
+        """Compile every variant up front; call at startup"""
+        self.reload(variants)
+
+    def reload(self, variants: Optional[Iterable[Tuple[Optional[str], Optional[str]]]] = None) -> None:
+        """Recompile all graphs and swap them in atomically"""
+        graphs, timings = self._build(variants or self.default_variants())
+        with self._lock:
+            self._graphs = graphs
+            self._compile_ms = timings
+            self.generation += 1
+        logger.info(f"Graph registry generation {self.generation}: {len(graphs)} graphs")
+
+    def get(
+        self,
+        context_type: Optional[str] = None,
+        task_type: Optional[str] = None,
+        persistent: bool = True
+    ):
+        """
+        The compiled graph for a context/task: the exact variant if precompiled, else
+        the context_type variant, else the default graph (compiled here if needed).
+        Variants that were not precompiled are never compiled on demand.
+        """
+        checkpointer = "postgres" if persistent else "memory"
+        graphs = self._graphs
+        for key in (
+            (context_type, task_type, checkpointer),
+            (context_type, None, checkpointer),
+            (None, None, checkpointer),
+        ):
+            graph = graphs.get(key)
+            if graph is not None:
+                return graph
+
+        # Not compiled at startup (e.g. in scripts): compile the default graph once
+        key = (None, None, checkpointer)
+        with self._lock:
+            if key not in self._graphs:
+                graph, elapsed_ms = self._compile(key)
+                self._graphs = {**self._graphs, key: graph}
+                self._compile_ms = {**self._compile_ms, key: elapsed_ms}
+            return self._graphs[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "graphs": [
+                {
+                    "context_type": context_type,
+                    "task_type": task_type,
+                    "checkpointer": checkpointer,
+                    "compile_ms": round(elapsed_ms, 2),
+                }
+                for (context_type, task_type, checkpointer), elapsed_ms in self._compile_ms.items()
+            ],
+        }
+
+
+graph_registry = GraphRegistry()
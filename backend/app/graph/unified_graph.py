@@ -11,16 +11,19 @@ The graph will be able to:
 from langgraph.graph import StateGraph, END, START
 from langgraph.graph.message import add_messages
 from app.agents.unified_agent import unified_agent_node
-from typing import TypedDict, Annotated, Dict, Any
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from typing import TypedDict, Annotated, Dict, Any, Optional
 
 # Shared state definition
 class State(TypedDict):
     messages: Annotated[list, add_messages]
     context: Dict[str, Any]  # Thread context info
     task_flags: Dict[str, bool]  # Checklists for each agent
+    summary: Dict[str, Any]  # Rolling summary of turns outside the context window
 
 # Define the graph
-def get_graph():
+def get_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """Compile the graph; with a checkpointer, LangGraph loads and saves thread state itself"""
     builder = StateGraph(State)
 
     # Add nodes
@@ -30,7 +33,7 @@ def get_graph():
     builder.add_edge(START, "main_agent")
     builder.add_edge("main_agent", END)
 
-    graph = builder.compile()
+    graph = builder.compile(checkpointer=checkpointer)
     graph.config = {"recursion_limit": 5}
 
     return graph
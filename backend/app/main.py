@@ -15,6 +15,8 @@ from app.api.chat import router as chat_router
 from app.api.video_router import router as video_router
 from app.api.threads import router as threads_router
 from app.api.checkpoints import router as checkpoints_router
+from app.graph.registry import graph_registry
+from app.services.activity_aggregator import thread_activity
 
 # Create FastAPI app
 app = FastAPI(
@@ -22,6 +24,20 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
 )
 
+# Compile the chat graphs once instead of per request
+@app.on_event("startup")
+async def compile_graphs():
+    graph_registry.compile_all()
+
+# Write thread activity behind in batches, and flush what is left on the way out
+@app.on_event("startup")
+async def start_activity_flush():
+    thread_activity.start()
+
+@app.on_event("shutdown")
+async def flush_thread_activity():
+    await thread_activity.stop()
+
 # Configure CORS
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -30,6 +46,8 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Pagination cursor and validator for GET /threads
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
 
 # Include user routes
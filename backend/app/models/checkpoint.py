@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, PrimaryKeyConstraint
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, LargeBinary, UUID
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.core.db import Base
@@ -6,10 +6,14 @@ from app.core.db import Base
 class LangGraphCheckpoint(Base):
     __tablename__ = "langgraph_checkpoints"
     
+    id = Column(Integer, primary_key=True)
+    thread_id = Column(UUID, ForeignKey("threads.thread_id", ondelete="CASCADE"), nullable=False)
     checkpoint_key = Column(JSONB, nullable=False)
-    state = Column(JSONB, nullable=False)
+    state = Column(JSONB, nullable=True)
+    state_blob = Column(LargeBinary, nullable=True)
+    message_count = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
     __table_args__ = (
-        PrimaryKeyConstraint('checkpoint_key', name='langgraph_checkpoints_pkey'),
-    ) 
\ No newline at end of file
+        Index('idx_langgraph_checkpoints_thread_id', 'thread_id', unique=True),
+    )
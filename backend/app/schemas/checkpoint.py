@@ -12,4 +12,13 @@ class CheckpointResponse(BaseModel):
     created_at: datetime
 
 class CheckpointReset(BaseModel):
-    thread_id: str 
\ No newline at end of file
+    thread_id: str
+
+class CheckpointRollback(BaseModel):
+    thread_id: str
+    version: int
+
+class CheckpointVersion(BaseModel):
+    version: int
+    message_count: int
+    created_at: datetime
@@ -19,4 +19,7 @@ class ThreadResponse(BaseModel):
 class ThreadMessagesResponse(BaseModel):
     thread_id: UUID4
     messages: List[Dict[str, Any]]
-    tool_outputs: List[str] = [] 
\ No newline at end of file
+    tool_outputs: List[str] = []
+    # Pass as `before` to fetch the next older page; None when there are no older messages
+    next_cursor: Optional[int] = None
+    total: int = 0 
\ No newline at end of file
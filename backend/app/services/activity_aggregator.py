@@ -0,0 +1,159 @@
+"""
+/app/services/activity_aggregator.py
+
+Write-behind aggregation of threads.last_activity_at.
+
+Every chat turn used to run its own `UPDATE threads SET last_activity_at =
+NOW()`, leaving a dead tuple on a hot table per turn. Turns now only record
+the time in memory here; every THREAD_ACTIVITY_FLUSH_INTERVAL seconds (and at
+shutdown) the latest time per thread is written with one batched
+`UPDATE ... FROM (VALUES ...)`, so a busy thread costs one row version per
+interval instead of one per turn. GREATEST keeps last_activity_at from moving
+backwards when several workers flush the same thread.
+
+A thread's activity, and so its position in GET /threads, can lag by up to one
+interval; a worker that dies without shutting down loses at most that much.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import session_scope
+from app.services.thread_list_cache import thread_list_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadActivityAggregator:
+    """Latest activity time per thread, flushed to the database in batches"""
+
+    def __init__(self, interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.interval = settings.THREAD_ACTIVITY_FLUSH_INTERVAL if interval is None else interval
+        self.batch_size = settings.THREAD_ACTIVITY_FLUSH_BATCH if batch_size is None else batch_size
+        self._pending: Dict[str, datetime] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def record(self, thread_id: str, at: Optional[datetime] = None) -> None:
+        """Note activity on a thread; it is written on the next flush"""
+        self._merge(thread_id, at or datetime.now(timezone.utc))
+        self.recorded += 1
+
+    def _merge(self, thread_id: str, at: datetime) -> None:
+        previous = self._pending.get(thread_id)
+        if previous is None or at > previous:
+            self._pending[thread_id] = at
+
+    async def flush(self) -> int:
+        """Write all pending activity; returns the number of threads updated"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+            started = time.perf_counter()
+            items = list(pending.items())
+            updated = 0
+            try:
+                async with session_scope() as session:
+                    for i in range(0, len(items), self.batch_size):
+                        updated += await self._write(session, items[i:i + self.batch_size])
+            except asyncio.CancelledError:
+                # Shutting down mid-flush: keep the batch for the final flush
+                for thread_id, at in items:
+                    self._merge(thread_id, at)
+                raise
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Error flushing activity for {len(items)} threads: {e}")
+                # Put the batch back, keeping anything newer recorded meanwhile
+                for thread_id, at in items:
+                    self._merge(thread_id, at)
+                return 0
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.rows_written += updated
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+            logger.info(f"Flushed activity for {len(items)} threads ({updated} rows) in {elapsed_ms:.1f} ms")
+            return updated
+
+    @staticmethod
+    async def _write(session, items: List[Any]) -> int:
+        values = ", ".join(
+            f"(cast(:thread_id_{i} as uuid), cast(:at_{i} as timestamptz))" for i in range(len(items))
+        )
+        params = {}
+        for i, (thread_id, at) in enumerate(items):
+            params[f"thread_id_{i}"] = thread_id
+            params[f"at_{i}"] = at
+
+        query = f"""
+        UPDATE threads AS t
+        SET last_activity_at = GREATEST(t.last_activity_at, v.at)
+        FROM (VALUES {values}) AS v(thread_id, at)
+        WHERE t.thread_id = v.thread_id
+          AND t.last_activity_at < v.at
+        RETURNING t.user_id
+        """
+
+        result = await session.execute(text(query), params)
+        user_ids: Set[int] = set()
+        updated = 0
+        for (user_id,) in result.fetchall():
+            user_ids.add(user_id)
+            updated += 1
+        # Thread lists are ordered by activity
+        for user_id in user_ids:
+            thread_list_cache.bump_after_commit(session, user_id)
+        return updated
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start the periodic flush; call at startup"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is pending; call at shutdown"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+thread_activity = ThreadActivityAggregator()
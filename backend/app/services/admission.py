@@ -0,0 +1,147 @@
+"""
+/app/services/admission.py
+
+Admission control for chat generations.
+
+At most CHAT_MAX_IN_FLIGHT generations run at once per process. Requests
+beyond that wait in per-user FIFO queues that are served round-robin, so one
+user firing many requests only delays their own queue, not everyone else's.
+A request that waits longer than CHAT_QUEUE_TIMEOUT is rejected with
+AdmissionRejected, which the API turns into a 429 with Retry-After.
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+import asyncio
+import logging
+import math
+import time
+
+from app.core.config import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request could not be admitted within the queue deadline"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many concurrent chat requests, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Global in-flight limit with per-user fair queuing"""
+
+    def __init__(self, max_in_flight: Optional[int] = None, queue_timeout: Optional[float] = None):
+        self.max_in_flight = settings.CHAT_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+        self.queue_timeout = settings.CHAT_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.in_flight = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        # Users with waiting requests, in round-robin order
+        self._turns: Deque[str] = deque()
+        # Moving average of how long an admitted request holds its slot
+        self._avg_hold = 5.0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for queue in self._queues.values() for waiter in queue if not waiter.done())
+
+    def _record_wait(self, waited: float) -> None:
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _retry_after(self) -> int:
+        # Time for the queue ahead to drain at the current service rate
+        return max(1, math.ceil(self._avg_hold * (self.queue_depth + 1) / max(1, self.max_in_flight)))
+
+    async def acquire(self, user_key: str) -> float:
+        """
+        Wait for a slot.
+
+        Returns:
+            The admission time, to pass back to release()
+
+        Raises:
+            AdmissionRejected: If no slot freed up within the queue timeout
+        """
+        started = time.monotonic()
+        if self.in_flight < self.max_in_flight and not self._turns:
+            self.in_flight += 1
+            self._record_wait(0.0)
+            return started
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user_key, deque()).append(waiter)
+        if user_key not in self._turns:
+            self._turns.append(user_key)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self.rejected += 1
+                logger.warning(f"Rejected chat request for {user_key} after {self.queue_timeout}s in queue")
+                raise AdmissionRejected(self._retry_after())
+            # Granted just as the deadline passed
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(time.monotonic())
+            else:
+                waiter.cancel()
+            raise
+
+        admitted_at = time.monotonic()
+        self._record_wait(admitted_at - started)
+        return admitted_at
+
+    def release(self, admitted_at: float) -> None:
+        """Free a slot and hand it to the next user in turn"""
+        self.in_flight -= 1
+        self._avg_hold = 0.9 * self._avg_hold + 0.1 * (time.monotonic() - admitted_at)
+
+        while self.in_flight < self.max_in_flight and self._turns:
+            user_key = self._turns.popleft()
+            queue = self._queues[user_key]
+            waiter = queue.popleft()
+            if queue:
+                self._turns.append(user_key)
+            else:
+                del self._queues[user_key]
+
+            if waiter.done():
+                # Timed out or disconnected while queued
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, user_key: str):
+        admitted_at = await self.acquire(user_key)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "queued_users": len(self._queues),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self.wait_seconds_total / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+            "avg_hold_seconds": self._avg_hold,
+        }
+
+
+chat_admission = AdmissionController()
@@ -0,0 +1,61 @@
+from typing import Dict, Any, Awaitable, Callable, Optional
+import logging
+import time
+
+from app.core.config import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class CheckpointBuffer:
+    """
+    Write-behind buffer that coalesces the checkpoint saves of a single chat turn.
+
+    Every staged state replaces the pending one instead of hitting the database.
+    The pending state is written when the turn ends (or fails, or the client goes
+    away) and, for long tool runs, at most once per flush interval in between.
+    """
+
+    def __init__(
+        self,
+        save: Callable[[Dict[str, Any]], Awaitable[bool]],
+        thread_id: str,
+        flush_interval: Optional[float] = None
+    ):
+        self.save = save
+        self.thread_id = thread_id
+        self.flush_interval = (
+            settings.CHECKPOINT_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        )
+        self._pending: Optional[Dict[str, Any]] = None
+        self._last_flush = time.monotonic()
+        self.staged = 0
+        self.flushes = 0
+
+    @property
+    def pending(self) -> Optional[Dict[str, Any]]:
+        """The latest staged state that has not been written yet"""
+        return self._pending
+
+    async def stage(self, state: Dict[str, Any]) -> None:
+        """Record the latest state, flushing only if the interval has elapsed"""
+        self._pending = state
+        self.staged += 1
+
+        if self.flush_interval > 0 and time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """Write the pending state, if any. Returns False if the save failed."""
+        if self._pending is None:
+            return True
+
+        state, self._pending = self._pending, None
+        self._last_flush = time.monotonic()
+        self.flushes += 1
+
+        logger.info(
+            f"Flushing checkpoint for thread: {self.thread_id} "
+            f"({self.staged} states staged, flush #{self.flushes})"
+        )
+        return await self.save(state)
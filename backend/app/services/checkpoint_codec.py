@@ -0,0 +1,185 @@
+"""
+/app/services/checkpoint_codec.py
+
+Pluggable codecs for checkpoint state.
+
+Binary codecs produce a blob that starts with a small header (magic, format
+version, codec id), so a row can always be decoded no matter which codec is
+configured when it is read. Rows written by the legacy "json" codec live in the
+JSONB `state` column and carry no header.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import struct
+
+import orjson
+import ormsgpack
+import zstandard
+from langchain_core.messages import BaseMessage
+
+from app.core.config import settings
+from app.services.message_codec import encode_message
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RCK"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("!3sBB")
+
+
+class CheckpointCodecError(Exception):
+    """Raised when a checkpoint blob cannot be decoded."""
+
+
+def serialize_object(obj: Any) -> Any:
+    """
+    Fallback serializer for objects the encoders do not handle natively.
+
+    LangChain messages are stored with the message codec's compact tagged
+    format instead of their whole __dict__ (additional_kwargs,
+    response_metadata, usage metadata and so on).
+    """
+    if isinstance(obj, BaseMessage):
+        return encode_message(obj)
+    if hasattr(obj, "isoformat"):  # For datetime objects
+        return obj.isoformat()
+    if hasattr(obj, "__dict__"):
+        return obj.__dict__
+    return str(obj)  # Fallback for other non-serializable objects
+
+
+class CheckpointCodec:
+    """Base class for checkpoint codecs."""
+
+    name: str = ""
+    codec_id: int = 0
+    # Binary codecs write to the BYTEA column, the legacy codec to JSONB
+    binary: bool = True
+
+    def encode(self, state: Any) -> bytes:
+        return _HEADER.pack(MAGIC, FORMAT_VERSION, self.codec_id) + self.encode_payload(state)
+
+    def encode_payload(self, state: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode_payload(self, payload: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JsonCodec(CheckpointCodec):
+    """Legacy codec: JSON text stored in the JSONB state column."""
+
+    name = "json"
+    binary = False
+
+    def encode(self, state: Any) -> str:
+        return json.dumps(state, default=serialize_object)
+
+
+class OrjsonCodec(CheckpointCodec):
+    name = "orjson"
+    codec_id = 1
+
+    def encode_payload(self, state: Any) -> bytes:
+        return orjson.dumps(state, default=serialize_object)
+
+    def decode_payload(self, payload: bytes) -> Any:
+        return orjson.loads(payload)
+
+
+class MsgpackCodec(CheckpointCodec):
+    name = "msgpack"
+    codec_id = 2
+
+    def encode_payload(self, state: Any) -> bytes:
+        return ormsgpack.packb(state, default=serialize_object)
+
+    def decode_payload(self, payload: bytes) -> Any:
+        return ormsgpack.unpackb(payload)
+
+
+class MsgpackZstdCodec(MsgpackCodec):
+    """msgpack compressed with zstd, optionally using a trained dictionary."""
+
+    name = "msgpack_zstd"
+    codec_id = 3
+
+    def __init__(self, level: int = 3, dictionary: Optional[bytes] = None):
+        self.level = level
+        self.dictionary = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+
+    def encode_payload(self, state: Any) -> bytes:
+        # Compressor objects are not thread safe, so build one per call; they are cheap
+        compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self.dictionary)
+        return compressor.compress(super().encode_payload(state))
+
+    def decode_payload(self, payload: bytes) -> Any:
+        decompressor = zstandard.ZstdDecompressor(dict_data=self.dictionary)
+        return super().decode_payload(decompressor.decompress(payload))
+
+
+def train_zstd_dictionary(samples: List[Dict[str, Any]], dict_size: int = 16 * 1024) -> bytes:
+    """
+    Train a zstd dictionary from sample checkpoint states.
+
+    Write the result to the file named by CHECKPOINT_ZSTD_DICT_PATH. Blobs written
+    with a dictionary can only be read back with that same dictionary.
+    """
+    encoded = [MsgpackCodec().encode_payload(sample) for sample in samples]
+    return zstandard.train_dictionary(dict_size, encoded).as_bytes()
+
+
+def _load_zstd_dictionary() -> Optional[bytes]:
+    path = settings.CHECKPOINT_ZSTD_DICT_PATH
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        logger.error(f"Could not load zstd dictionary from {path}: {e}")
+        return None
+
+
+_codecs: Dict[int, CheckpointCodec] = {}
+
+
+def _registry() -> Dict[int, CheckpointCodec]:
+    if not _codecs:
+        for codec in (
+            OrjsonCodec(),
+            MsgpackCodec(),
+            MsgpackZstdCodec(settings.CHECKPOINT_ZSTD_LEVEL, _load_zstd_dictionary()),
+        ):
+            _codecs[codec.codec_id] = codec
+    return _codecs
+
+
+def get_codec(name: Optional[str] = None) -> CheckpointCodec:
+    """Return the codec with the given name (defaults to CHECKPOINT_CODEC)."""
+    name = name or settings.CHECKPOINT_CODEC
+    if name == JsonCodec.name:
+        return JsonCodec()
+    for codec in _registry().values():
+        if codec.name == name:
+            return codec
+    raise ValueError(f"Unknown checkpoint codec: {name}")
+
+
+def decode_blob(blob: bytes) -> Any:
+    """Decode a blob written by any binary codec, using the codec named in its header."""
+    blob = bytes(blob)
+    if len(blob) < _HEADER.size:
+        raise CheckpointCodecError("Checkpoint blob is too short to contain a header")
+
+    magic, version, codec_id = _HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise CheckpointCodecError("Checkpoint blob has an unknown header")
+    if version != FORMAT_VERSION:
+        raise CheckpointCodecError(f"Unsupported checkpoint format version: {version}")
+
+    codec = _registry().get(codec_id)
+    if codec is None:
+        raise CheckpointCodecError(f"Unknown checkpoint codec id: {codec_id}")
+    return codec.decode_payload(blob[_HEADER.size:])
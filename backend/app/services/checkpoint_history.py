@@ -0,0 +1,152 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from typing import Dict, Any, List, Optional
+import hashlib
+import json
+import logging
+
+import orjson
+
+from app.services.checkpoint_codec import serialize_object
+from app.services.message_codec import encode_message
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Per-occurrence fields that are not part of a message's content address
+_OCCURRENCE_FIELDS = ("ts", "id")
+# Non-message state kept per version. LangGraph bookkeeping ("__lg__") is left out:
+# a restored version starts a fresh graph checkpoint instead of reviving stale channel versions
+_VERSIONED_STATE_KEYS = ("context", "task_flags", "summary")
+
+class CheckpointHistoryService:
+    """
+    Versioned checkpoint history backed by a content-addressed message store.
+
+    Each message body is stored once in checkpoint_messages, keyed by a hash of
+    its content. A version in checkpoint_versions is a list of
+    [hash, timestamp, message_id] references plus the context, task_flags and
+    summary keys, so repeated content (e.g. the same blog post produced twice)
+    is stored once and adding a version costs only the new messages and one
+    reference each.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @staticmethod
+    def message_hash(message: Dict[str, Any]) -> str:
+        body = {k: v for k, v in message.items() if k not in _OCCURRENCE_FIELDS}
+        return hashlib.blake2b(orjson.dumps(body, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+    async def record_version(self, thread_id: str, state: Dict[str, Any]) -> Optional[int]:
+        """
+        Add a version for the given state. Runs inside the caller's transaction.
+
+        Returns:
+            The new version number, or None if another writer took it first
+        """
+        query = text("""
+            SELECT version, message_refs
+            FROM checkpoint_versions
+            WHERE thread_id = cast(:thread_id as uuid)
+            ORDER BY version DESC
+            LIMIT 1
+        """)
+        previous = (await self.db.execute(query, {"thread_id": thread_id})).fetchone()
+
+        messages = state.get("messages", [])
+        encoded_messages = [encode_message(message) for message in messages]
+        refs = [
+            [self.message_hash(encoded), encoded.get("ts"), encoded.get("id")]
+            for encoded in encoded_messages
+        ]
+
+        # Bodies are already stored for the longest prefix that still matches the previous
+        # version; a message edited in place (same id, new content) ends the prefix
+        reused = 0
+        if previous:
+            for old_ref, ref in zip(previous.message_refs, refs):
+                if old_ref[0] != ref[0] or old_ref[2] != ref[2]:
+                    break
+                reused += 1
+
+        new_bodies = {}
+        for encoded, ref in zip(encoded_messages[reused:], refs[reused:]):
+            new_bodies[ref[0]] = {k: v for k, v in encoded.items() if k not in _OCCURRENCE_FIELDS}
+
+        if new_bodies:
+            query = text("""
+                INSERT INTO checkpoint_messages (message_hash, message)
+                SELECT m.message_hash, m.message
+                FROM jsonb_to_recordset(cast(:rows as jsonb)) AS m(message_hash TEXT, message JSONB)
+                ON CONFLICT (message_hash) DO NOTHING
+            """)
+            rows = [{"message_hash": h, "message": body} for h, body in new_bodies.items()]
+            await self.db.execute(query, {"rows": json.dumps(rows, default=serialize_object)})
+
+        version = (previous.version + 1) if previous else 1
+        state_patch = {key: state[key] for key in _VERSIONED_STATE_KEYS if key in state}
+        query = text("""
+            INSERT INTO checkpoint_versions (thread_id, version, message_refs, state_patch, message_count)
+            VALUES (cast(:thread_id as uuid), :version, cast(:message_refs as jsonb),
+                    cast(:state_patch as jsonb), :message_count)
+            ON CONFLICT (thread_id, version) DO NOTHING
+            RETURNING version
+        """)
+        result = await self.db.execute(query, {
+            "thread_id": thread_id,
+            "version": version,
+            "message_refs": json.dumps(refs),
+            "state_patch": json.dumps(state_patch, default=serialize_object),
+            "message_count": len(refs)
+        })
+        if result.scalar_one_or_none() is None:
+            logger.warning(f"Checkpoint version {version} already exists for thread: {thread_id}")
+            return None
+
+        logger.info(f"Recorded checkpoint version {version} for thread: {thread_id} ({len(new_bodies)} new message bodies)")
+        return version
+
+    async def list_versions(self, thread_id: str) -> List[Dict[str, Any]]:
+        """List a thread's checkpoint versions, newest first"""
+        query = text("""
+            SELECT version, message_count, created_at
+            FROM checkpoint_versions
+            WHERE thread_id = cast(:thread_id as uuid)
+            ORDER BY version DESC
+        """)
+        result = await self.db.execute(query, {"thread_id": thread_id})
+        return [dict(row._mapping) for row in result.fetchall()]
+
+    async def load_version(self, thread_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Rebuild the state stored for a version, or None if it does not exist"""
+        query = text("""
+            SELECT
+                v.message_refs,
+                v.state_patch,
+                (SELECT jsonb_object_agg(m.message_hash, m.message)
+                 FROM checkpoint_messages m
+                 WHERE m.message_hash IN (
+                     SELECT DISTINCT ref ->> 0 FROM jsonb_array_elements(v.message_refs) AS ref
+                 )) AS bodies
+            FROM checkpoint_versions v
+            WHERE v.thread_id = cast(:thread_id as uuid) AND v.version = :version
+        """)
+        row = (await self.db.execute(query, {"thread_id": thread_id, "version": version})).fetchone()
+        if row is None:
+            return None
+
+        bodies = row.bodies or {}
+        messages = []
+        for message_hash, timestamp, message_id in row.message_refs:
+            message = dict(bodies[message_hash])
+            if timestamp:
+                message["ts"] = timestamp
+            if message_id:
+                message["id"] = message_id
+            messages.append(message)
+
+        state = dict(row.state_patch or {})
+        state["messages"] = messages
+        return state
@@ -1,46 +1,61 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import json
 import logging
 import traceback
 
+from app.core.config import settings
+from app.core.cache import ByteLRUCache
+from app.services.checkpoint_codec import get_codec, decode_blob, serialize_object
+from app.services.checkpoint_history import CheckpointHistoryService
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Decoded thread states shared by every CheckpointService in this process.
+# Entries are replaced on save and dropped on delete; the TTL bounds how long
+# a write made by another worker process can go unnoticed.
+checkpoint_cache = ByteLRUCache(
+    max_bytes=settings.CHECKPOINT_CACHE_MAX_BYTES,
+    ttl=settings.CHECKPOINT_CACHE_TTL
+)
+
+# Non-message keys last written per thread, used to skip unchanged keys in deltas.
+# Shared because the checkpointer creates a CheckpointService per save; an evicted
+# or expired entry only means the next delta carries every key again.
+delta_patches = ByteLRUCache(
+    max_bytes=8 * 1024 * 1024,
+    ttl=settings.CHECKPOINT_CACHE_TTL
+)
+
 class CheckpointService:
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.codec = get_codec()
+        self.history = CheckpointHistoryService(db)
     
     async def save_checkpoint(self, checkpoint_key: Dict[str, Any], state: Dict[str, Any]) -> bool:
         """Save a checkpoint to the database"""
         try:
-            # Serialize both objects to JSON strings
-            serialized_key = json.dumps(checkpoint_key)
-            serialized_state = json.dumps(state, default=self._serialize_objects)
-            
-            logger.info(f"Attempting to save checkpoint with key: {serialized_key[:50]}...")
+            if settings.CHECKPOINT_STORAGE_MODE == "delta":
+                await self._append_delta(checkpoint_key, state)
+            else:
+                await self._write_snapshot(checkpoint_key, state)
             
-            # Use simple PostgreSQL-compatible approach to JSONB handling
-            query = text("""
-            INSERT INTO langgraph_checkpoints (checkpoint_key, state) 
-            VALUES (cast(:key as jsonb), cast(:state as jsonb)) 
-            ON CONFLICT ((checkpoint_key->>'thread_id')) DO UPDATE 
-            SET state = cast(:state as jsonb), created_at = NOW()
-            """)
-            
-            # Execute the query with the proper parameters
-            await self.db.execute(
-                query,
-                {"key": serialized_key, "state": serialized_state}
-            )
+            # Record a version in the same transaction so history never diverges from the state
+            if settings.CHECKPOINT_HISTORY_ENABLED:
+                await self.history.record_version(checkpoint_key.get("thread_id"), state)
             
             # Always explicitly commit the transaction
             await self.db.commit()
             
-            # Log success with thread_id for easier debugging
+            # Keep the hot cache in the same shape get_checkpoint returns
             thread_id = checkpoint_key.get("thread_id", "unknown")
+            checkpoint_cache.set(str(thread_id), self._plain_state(state))
+            
+            # Log success with thread_id for easier debugging
             logger.info(f"✅ Checkpoint saved successfully for thread: {thread_id}")
             return True
                 
@@ -48,12 +63,162 @@ class CheckpointService:
             logger.error(f"Error saving checkpoint: {e}")
             logger.error(traceback.format_exc())
             await self.db.rollback()
+            # The stored state is now unknown, so do not serve a stale copy
+            checkpoint_cache.delete(str(checkpoint_key.get("thread_id")))
+            delta_patches.delete(str(checkpoint_key.get("thread_id")))
             return False
     
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the in-process checkpoint cache"""
+        return checkpoint_cache.stats()
+    
+    @staticmethod
+    def _plain_state(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert message objects to the dicts a decoded checkpoint contains"""
+        plain = dict(state)
+        plain["messages"] = [
+            msg if isinstance(msg, dict) else serialize_object(msg)
+            for msg in state.get("messages", [])
+        ]
+        return plain
+    
+    async def _write_snapshot(self, checkpoint_key: Dict[str, Any], state: Dict[str, Any]) -> None:
+        """Upsert the full state as the snapshot row for a thread"""
+        # Serialize the key to JSON and the state with the configured codec
+        serialized_key = json.dumps(checkpoint_key)
+        encoded_state = self.codec.encode(state)
+        
+        logger.info(f"Attempting to save checkpoint with key: {serialized_key[:50]}... (codec: {self.codec.name})")
+        
+        # Binary codecs write to state_blob, the legacy JSON codec to the JSONB column
+        query = text("""
+        INSERT INTO langgraph_checkpoints (thread_id, checkpoint_key, state, state_blob, message_count) 
+        VALUES (cast(:thread_id as uuid), cast(:key as jsonb), cast(:state as jsonb), :state_blob, :message_count) 
+        ON CONFLICT (thread_id) DO UPDATE 
+        SET state = cast(:state as jsonb), state_blob = :state_blob,
+            message_count = :message_count, created_at = NOW()
+        """)
+        
+        # Execute the query with the proper parameters
+        await self.db.execute(
+            query,
+            {
+                "thread_id": checkpoint_key.get("thread_id"),
+                "key": serialized_key,
+                "state": None if self.codec.binary else encoded_state,
+                "state_blob": encoded_state if self.codec.binary else None,
+                "message_count": len(state.get("messages", []))
+            }
+        )
+        
+        # The snapshot now holds everything, so any logged deltas are obsolete
+        if settings.CHECKPOINT_STORAGE_MODE == "delta":
+            await self.db.execute(
+                text("DELETE FROM langgraph_checkpoint_deltas WHERE thread_id = cast(:thread_id as uuid)"),
+                {"thread_id": checkpoint_key.get("thread_id")}
+            )
+        delta_patches.delete(str(checkpoint_key.get("thread_id")))
+    
+    async def _append_delta(self, checkpoint_key: Dict[str, Any], state: Dict[str, Any]) -> None:
+        """
+        Append only the messages and top-level keys that changed since the last save.
+        
+        Falls back to a snapshot write when the thread has no snapshot yet, when the
+        message list shrank (e.g. after a reset), or when enough deltas have piled up
+        that the log should be compacted.
+        """
+        thread_id = checkpoint_key.get("thread_id")
+        
+        # Find out how many messages are already persisted and how long the log is
+        query = text("""
+            SELECT
+                c.message_count AS snapshot_count,
+                d.message_count AS log_count,
+                (SELECT count(*) FROM langgraph_checkpoint_deltas
+                 WHERE thread_id = cast(:thread_id as uuid)) AS delta_count
+            FROM (SELECT 1) AS one
+            LEFT JOIN langgraph_checkpoints c
+                ON c.thread_id = cast(:thread_id as uuid)
+            LEFT JOIN LATERAL (
+                SELECT message_count FROM langgraph_checkpoint_deltas
+                WHERE thread_id = cast(:thread_id as uuid)
+                ORDER BY id DESC
+                LIMIT 1
+            ) d ON TRUE
+        """)
+        row = (await self.db.execute(query, {"thread_id": thread_id})).fetchone()
+        
+        messages = state.get("messages", [])
+        persisted_count = row.log_count if row.log_count is not None else row.snapshot_count
+        
+        if (
+            persisted_count is None
+            or len(messages) < persisted_count
+            or row.delta_count >= settings.CHECKPOINT_COMPACTION_INTERVAL
+        ):
+            logger.info(f"Compacting checkpoint log into a snapshot for thread: {thread_id}")
+            await self._write_snapshot(checkpoint_key, state)
+            return
+        
+        # Only carry top-level keys whose value differs from what was last written for the thread
+        patch = {key: value for key, value in state.items() if key != "messages"}
+        previous_patch = delta_patches.get(str(thread_id))
+        changed = {key: value for key, value in patch.items()
+                   if previous_patch is None or previous_patch.get(key) != value}
+        new_messages = messages[persisted_count:]
+        
+        if not new_messages and not changed:
+            logger.info(f"No checkpoint changes to append for thread: {thread_id}")
+            return
+        
+        if self.codec.binary:
+            values = {
+                "messages": "[]",
+                "state_patch": None,
+                "payload": self.codec.encode({"messages": new_messages, "state_patch": changed or None})
+            }
+        else:
+            values = {
+                "messages": self.codec.encode(new_messages),
+                "state_patch": self.codec.encode(changed) if changed else None,
+                "payload": None
+            }
+        
+        query = text("""
+        INSERT INTO langgraph_checkpoint_deltas (thread_id, messages, state_patch, payload, message_count)
+        VALUES (cast(:thread_id as uuid), cast(:messages as jsonb), cast(:state_patch as jsonb), :payload, :message_count)
+        """)
+        await self.db.execute(
+            query,
+            {"thread_id": thread_id, "message_count": len(messages), **values}
+        )
+        delta_patches.set(str(thread_id), patch)
+        logger.info(f"Appended {len(new_messages)} messages to checkpoint log for thread: {thread_id}")
+    
+    @staticmethod
+    def prime_cache(thread_id: str, state: Any, state_blob: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        """
+        Cache a checkpoint row that was read by another query (e.g. the turn bootstrap),
+        so the next get_checkpoint does not go back to the database.
+        
+        In delta mode the snapshot row alone is not the current state, so nothing is cached.
+        """
+        if settings.CHECKPOINT_STORAGE_MODE == "delta":
+            return None
+        state = decode_blob(state_blob) if state_blob is not None else state
+        if isinstance(state, dict):
+            checkpoint_cache.set(str(thread_id), state)
+            return state
+        return None
+    
     async def get_checkpoint(self, key: Dict):
         """
         Retrieve a checkpoint by key.
         
+        Served from the in-process cache when possible. The returned state is
+        shared with the cache and must not be mutated by the caller.
+        
         Args:
             key: Dictionary containing at least thread_id
             
@@ -64,16 +229,20 @@ class CheckpointService:
         if not thread_id:
             logging.error("Missing thread_id in checkpoint key")
             return None
+        
+        cached = checkpoint_cache.get(str(thread_id))
+        if cached is not None:
+            logging.info(f"Checkpoint cache hit for thread_id: {thread_id}")
+            return cached
             
         try:
             logging.info(f"Retrieving checkpoint for thread_id: {thread_id}")
             
-            # Fetch checkpoint using direct thread_id match
+            # Fetch checkpoint through the indexed thread_id column
             query = text("""
-                SELECT state 
+                SELECT state, state_blob 
                 FROM langgraph_checkpoints
-                WHERE checkpoint_key ->> 'thread_id' = :thread_id
-                LIMIT 1
+                WHERE thread_id = cast(:thread_id as uuid)
             """)
             
             result = await self.db.execute(
@@ -84,7 +253,13 @@ class CheckpointService:
             checkpoint = result.fetchone()
             
             if checkpoint:
-                state = checkpoint.state
+                # Rows written by a binary codec carry their codec in the blob header
+                if checkpoint.state_blob is not None:
+                    state = decode_blob(checkpoint.state_blob)
+                else:
+                    state = checkpoint.state
+                if settings.CHECKPOINT_STORAGE_MODE == "delta" and isinstance(state, dict):
+                    state = await self._apply_deltas(thread_id, state)
                 logging.info(f"Found checkpoint for thread_id: {thread_id}")
                 # Log a preview of the state structure for debugging
                 if isinstance(state, dict):
@@ -96,6 +271,7 @@ class CheckpointService:
                     if "messages" in state and state["messages"]:
                         sample_msg = state["messages"][0]
                         logging.info(f"Sample message structure: {str(sample_msg)[:200]}...")
+                    checkpoint_cache.set(str(thread_id), state)
                 return state
             else:
                 logging.warning(f"No checkpoint found for thread_id: {thread_id}")
@@ -105,6 +281,33 @@ class CheckpointService:
             logging.error(f"Error retrieving checkpoint: {e}")
             raise
     
+    async def _apply_deltas(self, thread_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuild the current state by replaying logged deltas on top of a snapshot"""
+        query = text("""
+            SELECT messages, state_patch, payload
+            FROM langgraph_checkpoint_deltas
+            WHERE thread_id = cast(:thread_id as uuid)
+            ORDER BY id
+        """)
+        deltas = (await self.db.execute(query, {"thread_id": thread_id})).fetchall()
+        if not deltas:
+            return state
+        
+        state = dict(state)
+        state["messages"] = list(state.get("messages", []))
+        for delta in deltas:
+            if delta.payload is not None:
+                payload = decode_blob(delta.payload)
+                new_messages, patch = payload.get("messages"), payload.get("state_patch")
+            else:
+                new_messages, patch = delta.messages, delta.state_patch
+            state["messages"].extend(new_messages or [])
+            if patch:
+                state.update(patch)
+        
+        logging.info(f"Applied {len(deltas)} checkpoint deltas for thread_id: {thread_id}")
+        return state
+    
     async def delete_checkpoint(self, checkpoint_key: Dict[str, Any]) -> bool:
         """Delete a checkpoint from the database"""
         try:
@@ -116,13 +319,22 @@ class CheckpointService:
                 
             logger.info(f"Attempting to delete checkpoint for thread: {thread_id}")
             
-            # Use direct key match on thread_id instead of using the @> operator
+            # Delete through the indexed thread_id column
             query = text("""
             DELETE FROM langgraph_checkpoints 
-            WHERE checkpoint_key->>'thread_id' = :thread_id
+            WHERE thread_id = cast(:thread_id as uuid)
             """)
             
             result = await self.db.execute(query, {"thread_id": thread_id})
+            checkpoint_cache.delete(str(thread_id))
+            
+            # Drop the delta log as well so it is not replayed onto a future snapshot
+            if settings.CHECKPOINT_STORAGE_MODE == "delta":
+                await self.db.execute(
+                    text("DELETE FROM langgraph_checkpoint_deltas WHERE thread_id = cast(:thread_id as uuid)"),
+                    {"thread_id": thread_id}
+                )
+            delta_patches.delete(str(thread_id))
             await self.db.commit()
             
             # Check how many rows were affected
@@ -196,15 +408,82 @@ class CheckpointService:
             logger.error(traceback.format_exc())
             return None
     
-    def _serialize_objects(self, obj):
-        """Custom JSON serializer that handles special objects"""
-        try:
-            # Add support for any special object types that need custom serialization
-            if hasattr(obj, "__dict__"):
-                return obj.__dict__
-            if hasattr(obj, "isoformat"):  # For datetime objects
-                return obj.isoformat()
-            return str(obj)  # Fallback for other non-serializable objects
-        except Exception as e:
-            logger.error(f"Error serializing object: {e}")
-            return str(obj)  # Fallback to string representation 
\ No newline at end of file
+    async def get_message_page(
+        self,
+        thread_id: str,
+        limit: Optional[int] = None,
+        before: Optional[int] = None
+    ) -> Tuple[List[Any], Optional[int], int]:
+        """
+        Retrieve a window of a thread's stored messages, newest first by page.
+        
+        Messages are addressed by their position in the thread. A page holds up to
+        `limit` messages ending just before position `before` (or at the newest
+        message), in chronological order.
+        
+        Args:
+            thread_id: The thread ID to read messages from
+            limit: Maximum number of messages to return, or None for all
+            before: Position cursor from a previous page, or None to start at the newest
+            
+        Returns:
+            (messages, next_cursor, total) where next_cursor is None on the oldest page
+        """
+        cached = checkpoint_cache.get(str(thread_id))
+        if cached is None and self.codec.name == "json" and settings.CHECKPOINT_STORAGE_MODE == "full":
+            # Slice the JSONB array in the database so only the window is sent and decoded
+            query = text("""
+                WITH bounds AS (
+                    SELECT
+                        state->'messages' AS messages,
+                        COALESCE(message_count, jsonb_array_length(state->'messages')) AS total
+                    FROM langgraph_checkpoints
+                    WHERE thread_id = cast(:thread_id as uuid) AND state IS NOT NULL
+                ), window_bounds AS (
+                    SELECT messages, total, LEAST(COALESCE(cast(:before as integer), total), total) AS hi
+                    FROM bounds
+                )
+                SELECT
+                    total,
+                    GREATEST(hi - COALESCE(cast(:limit as integer), hi), 0) AS lo,
+                    COALESCE(
+                        (SELECT jsonb_agg(messages -> i ORDER BY i)
+                         FROM generate_series(GREATEST(hi - COALESCE(cast(:limit as integer), hi), 0), hi - 1) AS i),
+                        '[]'::jsonb
+                    ) AS page
+                FROM window_bounds
+            """)
+            row = (await self.db.execute(
+                query,
+                {"thread_id": thread_id, "limit": limit, "before": before}
+            )).fetchone()
+            if row is not None:
+                logger.info(f"Read messages [{row.lo}:{row.lo + len(row.page)}] of {row.total} for thread: {thread_id}")
+                return row.page, (row.lo if row.lo > 0 else None), row.total
+        
+        # Binary codecs and delta logs cannot be sliced server-side; decode (or hit the cache) instead
+        state = cached if cached is not None else await self.get_checkpoint({"thread_id": thread_id})
+        messages = state.get("messages", []) if state else []
+        total = len(messages)
+        hi = total if before is None else min(before, total)
+        lo = max(hi - limit, 0) if limit is not None else 0
+        return messages[lo:hi], (lo if lo > 0 else None), total
+    
+    async def rollback_to_version(self, thread_id: str, version: int) -> bool:
+        """
+        Restore a thread's checkpoint to a previous version.
+        
+        The restored state is saved as a new version, so the rollback itself
+        can be undone.
+        
+        Returns:
+            False if the version does not exist or the save failed
+        """
+        state = await self.history.load_version(thread_id, version)
+        if state is None:
+            logger.warning(f"No checkpoint version {version} for thread: {thread_id}")
+            return False
+        
+        logger.info(f"Rolling back thread: {thread_id} to checkpoint version {version}")
+        return await self.save_checkpoint({"thread_id": thread_id}, state)
+
@@ -1,16 +1,16 @@
 # langgraph_chat_service.py
 
-from langchain_core.messages import HumanMessage, ToolMessage, AIMessage
-from typing import Dict, Any, AsyncGenerator, List, Optional
-from app.graph.unified_graph import get_graph
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from app.core.db import get_db
-from fastapi import Depends
+from langchain_core.messages import HumanMessage, ToolMessage, AIMessage, AIMessageChunk, RemoveMessage
+from typing import Dict, Any, AsyncGenerator, Optional
+from app.graph.registry import graph_registry
+from app.graph.checkpointer import postgres_checkpointer
+from app.core.db import session_scope
 from app.services.checkpoint_service import CheckpointService
 from app.services.thread_service import ThreadService
-import json
+from app.services.activity_aggregator import thread_activity
+import asyncio
 import logging
+import time
 
 # Helper function to serialize LangChain messages
 def serialize_messages(obj):
@@ -26,151 +26,84 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class LangGraphChatService:
-    def __init__(self, db: AsyncSession = None):
-        self.graph = get_graph()
-        self.db = db
-        self.checkpoint_service = CheckpointService(db) if db else None
-        self.thread_service = ThreadService(db) if db else None
+    def __init__(self, persistent: bool = True):
+        # Every DB operation opens its own short-lived session (see session_scope), so no
+        # pooled connection is held while the LLM is generating
+        self.persistent = persistent
+
+    async def bootstrap_turn(
+        self,
+        thread_id: str,
+        message: str,
+        user_id: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Validate the thread, set its title and load its checkpoint in a single query,
+        then record the thread's activity. Returns None if the thread does not exist
+        or is not the user's.
+        """
+        if not self.persistent:
+            return {"thread_id": thread_id}
+        
+        async with session_scope() as session:
+            turn = await ThreadService(session).bootstrap_turn(thread_id, message, user_id)
+        if turn:
+            thread_activity.record(thread_id)
+            # The checkpointer will find the state in the cache instead of querying again
+            CheckpointService.prime_cache(thread_id, turn.pop("state"), turn.pop("state_blob"))
+        return turn
 
     async def stream_response(
         self, 
         message: str, 
         thread_id: str, 
         context_type: str = "general_chat", 
-        task_type: str = None
+        task_type: str = None,
+        use_cache: bool = True,
+        batch: bool = False,
+        bootstrapped: bool = False
     ) -> AsyncGenerator[Dict[str, Any], None]:
         user_message = HumanMessage(content=message)
         
         # Log context information
         logger.info(f"Processing request for thread_id={thread_id}, context_type={context_type}, task_type={task_type}")
         
-        # Create checkpoint key from thread_id
-        checkpoint_key = {"thread_id": thread_id}
-        
-        # Create config with thread info
+        # LangGraph loads the thread's checkpoint and appends the new message itself
         config = {
             "configurable": {
                 "thread_id": thread_id,
                 "context_type": context_type,
-                "task_type": task_type
+                "task_type": task_type,
+                # False bypasses the LLM response cache for this turn
+                "use_cache": use_cache,
+                # True lets the LLM call join a micro-batch instead of streaming
+                "batch": batch
             }
         }
-        
-        # Try to get existing state from checkpoint
-        try:
-            if self.db and self.checkpoint_service:
-                # Get existing checkpoint data
-                state = await self.checkpoint_service.get_checkpoint(checkpoint_key)
-                
-                if state:
-                    # Need to properly deserialize messages from the checkpoint
-                    messages = []
-                    raw_messages = state.get("messages", [])
-                    
-                    for msg in raw_messages:
-                        if isinstance(msg, dict):
-                            # Handle different message formats
-                            if "type" in msg and msg["type"] == "human":
-                                messages.append(HumanMessage(content=msg.get("content", "")))
-                            elif "type" in msg and msg["type"] == "ai":
-                                messages.append(AIMessage(content=msg.get("content", "")))
-                            elif "type" in msg and msg["type"] == "tool":
-                                messages.append(ToolMessage(content=msg.get("content", ""), tool_call_id=msg.get("tool_call_id", "")))
-                            # Handle LangChain serialized messages
-                            elif "kwargs" in msg and isinstance(msg["kwargs"], dict):
-                                content = msg["kwargs"].get("content", "")
-                                msg_type = msg["kwargs"].get("type", "")
-                                
-                                if msg_type == "human":
-                                    messages.append(HumanMessage(content=content))
-                                elif msg_type == "ai":
-                                    messages.append(AIMessage(content=content))
-                                elif msg_type == "tool":
-                                    tool_id = msg["kwargs"].get("tool_call_id", "")
-                                    messages.append(ToolMessage(content=content, tool_call_id=tool_id))
-                            else:
-                                # Try to infer message type from structure
-                                content = msg.get("content", "")
-                                if any(user_term in str(msg).lower() for user_term in ["human", "user"]):
-                                    messages.append(HumanMessage(content=content))
-                                else:
-                                    messages.append(AIMessage(content=content))
-                    
-                    # Add new message
-                    messages.append(user_message)
-                    
-                    # Recreate state with proper message objects
-                    state = {
-                        "messages": messages,
-                        "context": {
-                            "type": context_type,
-                            "task": task_type
-                        },
-                        "task_flags": state.get("task_flags", {})
-                    }
-                    
-                    logger.info(f"Retrieved existing checkpoint for thread_id={thread_id}")
-                else:
-                    # Initialize new state if no checkpoint found
-                    logger.info(f"No checkpoint found for thread_id={thread_id}, creating new state")
-                    state = {
-                        "messages": [user_message],
-                        "context": {
-                            "type": context_type,
-                            "task": task_type
-                        },
-                        "task_flags": {}
-                    }
-            else:
-                # Try to get state from graph memory if no DB
-                try:
-                    current_state = self.graph.get_state({"configurable": {"thread_id": thread_id}})
-                    state = {"messages": current_state.get("messages", []) + [user_message]}
-                except:
-                    state = {"messages": [user_message]}
-                
-                # Add context
-                state["context"] = {
-                    "type": context_type,
-                    "task": task_type
-                }
-                state["task_flags"] = state.get("task_flags", {})
-                logger.info(f"Using in-memory state for thread_id={thread_id}")
-        except Exception as e:
-            logger.error(f"Error retrieving checkpoint: {e}")
-            # Initialize new state on error
-            state = {
-                "messages": [user_message],
-                "context": {
-                    "type": context_type,
-                    "task": task_type
-                },
-                "task_flags": {}
+        state = {
+            "messages": [user_message],
+            "context": {
+                "type": context_type,
+                "task": task_type
             }
+        }
         
-        # Update thread last activity
-        if self.db and self.thread_service:
-            try:
-                await self.thread_service.update_thread_activity(thread_id)
-                logger.info(f"Updated last_activity_at for thread_id={thread_id}")
-            except Exception as e:
-                logger.error(f"Error updating thread activity: {e}")
+        # Record thread activity (bootstrap_turn already did); it is written behind in batches
+        if self.persistent and not bootstrapped:
+            thread_activity.record(thread_id)
         
         # Stream response from graph
         tool_outputs = []
         logger.info(f"Streaming response from graph for thread_id={thread_id}, context={state['context']}")
         
-        async for event in self.graph.astream(state, config=config, stream_mode="values"):
-            # Store checkpoint after each event if DB is available
-            if self.db and self.checkpoint_service:
-                try:
-                    # Save the checkpoint
-                    await self.checkpoint_service.save_checkpoint(checkpoint_key, event)
-                except Exception as e:
-                    logger.error(f"Error storing checkpoint: {e}")
-            
-            # Process any new messages
-            for msg in event.get("messages", []):
+        started = time.perf_counter()
+        first_token_at = None
+        try:
+            # "messages" mode yields LLM chunks as they are generated and node
+            # output messages (tool results) once the node finishes
+            # Shared precompiled graph; thread state is persisted by its checkpointer
+            graph = graph_registry.get(context_type, task_type, persistent=self.persistent)
+            async for msg, metadata in graph.astream(state, config=config, stream_mode="messages"):
                 if isinstance(msg, ToolMessage):
                     tool_outputs.append(msg.content)
                     yield {
@@ -179,15 +112,31 @@ class LangGraphChatService:
                         "tool_name": msg.tool_call_id,
                         "complete": True
                     }
-                elif isinstance(msg, AIMessage):
+                elif isinstance(msg, (AIMessageChunk, AIMessage)) and isinstance(msg.content, str) and msg.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        logger.info(
+                            f"First token for thread_id={thread_id} after "
+                            f"{(first_token_at - started) * 1000:.0f} ms"
+                        )
+                    # Only the new text; consumers append it to the current response
                     yield {
                         "content": msg.content,
                         "type": "response",
-                        "complete": False
+                        "complete": False,
+                        "delta": True
                     }
+        finally:
+            # The checkpointer coalesces the turn's checkpoints; write them on completion,
+            # error and client disconnect alike, shielded so a cancelled stream still persists
+            if self.persistent:
+                try:
+                    await asyncio.shield(postgres_checkpointer.aflush(thread_id))
+                except Exception as e:
+                    logger.error(f"Error flushing checkpoint: {e}")
 
         # Final response
-        logger.info(f"Completed response for thread_id={thread_id}")
+        logger.info(f"Completed response for thread_id={thread_id} in {(time.perf_counter() - started) * 1000:.0f} ms")
         yield {
             "content": "",
             "type": "response",
@@ -200,27 +149,38 @@ class LangGraphChatService:
         success = True
         
         # Delete checkpoint for this thread if DB is available
-        if self.db and self.checkpoint_service:
+        if self.persistent:
             checkpoint_key = {"thread_id": thread_id}
             try:
-                success = await self.checkpoint_service.delete_checkpoint(checkpoint_key)
-                # Initialize a new empty checkpoint
-                if success:
-                    await self.checkpoint_service.initialize_empty_checkpoint(
-                        thread_id=thread_id,
-                        context_type="general_chat"
-                    )
+                postgres_checkpointer.discard(thread_id)
+                async with session_scope() as session:
+                    checkpoint_service = CheckpointService(session)
+                    success = await checkpoint_service.delete_checkpoint(checkpoint_key)
+                    # Initialize a new empty checkpoint
+                    if success:
+                        await checkpoint_service.initialize_empty_checkpoint(
+                            thread_id=thread_id,
+                            context_type="general_chat"
+                        )
                 logger.info(f"Reset checkpoint for thread_id={thread_id}")
             except Exception as e:
                 logger.error(f"Error resetting checkpoint: {e}")
                 success = False
+            return success
         
-        # Also reset in-memory state
+        # Otherwise reset the in-memory state; add_messages only removes by id
         try:
-            self.graph.update_state({"configurable": {"thread_id": thread_id}}, {"messages": []})
+            config = {"configurable": {"thread_id": thread_id}}
+            graph = graph_registry.get(persistent=False)
+            snapshot = await graph.aget_state(config)
+            messages = snapshot.values.get("messages", [])
+            if messages:
+                await graph.aupdate_state(
+                    config, {"messages": [RemoveMessage(id=m.id) for m in messages]}
+                )
             logger.info(f"Reset in-memory state for thread_id={thread_id}")
         except Exception as e:
             logger.error(f"Error resetting in-memory state: {e}")
             success = False
             
-        return success 
\ No newline at end of file
+        return success
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+/app/services/message_codec.py
+
+Versioned codec for chat messages stored in checkpoints.
+
+Messages are stored as compact tagged dicts:
+
+    {"v": 1, "r": "human", "c": "Hi!", "id": "...", "ts": "2025-01-01T12:00:00+00:00"}
+
+with optional "tid" (tool_call_id), "st" (tool status, only when not
+"success") and "tc" (tool_calls) entries. One pass over
+a stored message yields either a LangChain message or the dict the threads API
+returns. Rows written before the codec existed (plain {"type": ...} dicts,
+LangChain `to_json()` output, {"role": ...} dicts and bare strings) are
+normalized on read and rewritten in the current format on the next save.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+CODEC_VERSION = 1
+
+_MESSAGE_CLASSES = {
+    "human": HumanMessage,
+    "ai": AIMessage,
+    "tool": ToolMessage,
+    "system": SystemMessage,
+}
+
+# Aliases seen in legacy rows and API payloads
+_ROLE_ALIASES = {
+    "user": "human",
+    "assistant": "ai",
+    "HumanMessage": "human",
+    "AIMessage": "ai",
+    "ToolMessage": "tool",
+    "SystemMessage": "system",
+}
+
+_API_ROLES = {
+    "human": "user",
+    "ai": "assistant",
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def stamp_message(message: BaseMessage) -> BaseMessage:
+    """
+    Give a message its creation timestamp, once.
+
+    Called when a message is first staged for a checkpoint, so the cached,
+    persisted and history copies of it all carry the same time.
+    """
+    if message.response_metadata is None:
+        message.response_metadata = {}
+    message.response_metadata.setdefault("ts", _now())
+    return message
+
+
+def encode_message(message: Any) -> Dict[str, Any]:
+    """Encode a LangChain message (or any legacy stored form) in the current format."""
+    if isinstance(message, BaseMessage):
+        data = {
+            "v": CODEC_VERSION,
+            "r": message.type,
+            "c": message.content,
+        }
+        # The timestamp travels in response_metadata, which is never sent to the model
+        timestamp = (message.response_metadata or {}).get("ts")
+        if timestamp:
+            data["ts"] = timestamp
+        if message.id:
+            data["id"] = message.id
+        tool_call_id = getattr(message, "tool_call_id", None)
+        if tool_call_id:
+            data["tid"] = tool_call_id
+        status = getattr(message, "status", None)
+        if status and status != "success":
+            data["st"] = status
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            data["tc"] = [dict(tool_call) for tool_call in tool_calls]
+        return data
+
+    return _normalize(message)
+
+
+def encode_messages(messages: Iterable[Any]) -> List[Dict[str, Any]]:
+    return [encode_message(message) for message in messages]
+
+
+def decode_message(raw: Any) -> BaseMessage:
+    """Decode a stored message into a LangChain message object."""
+    data = raw if isinstance(raw, dict) and raw.get("v") == CODEC_VERSION else _normalize(raw)
+    role = data.get("r")
+    kwargs: Dict[str, Any] = {"content": data.get("c", "")}
+
+    if data.get("id"):
+        kwargs["id"] = data["id"]
+    if data.get("ts"):
+        kwargs["response_metadata"] = {"ts": data["ts"]}
+
+    if role == "tool":
+        return ToolMessage(tool_call_id=data.get("tid", ""), status=data.get("st", "success"), **kwargs)
+    if role == "ai":
+        return AIMessage(tool_calls=data.get("tc", []), **kwargs)
+    # Unknown roles are treated as assistant output, as the legacy reader did
+    return _MESSAGE_CLASSES.get(role, AIMessage)(**kwargs)
+
+
+def decode_messages(raws: Iterable[Any]) -> List[BaseMessage]:
+    return [decode_message(raw) for raw in raws]
+
+
+def to_api_dict(raw: Any) -> Dict[str, Any]:
+    """Decode a stored message into the dict returned by the threads API."""
+    data = raw if isinstance(raw, dict) and raw.get("v") == CODEC_VERSION else _normalize(raw)
+    role = data.get("r", "unknown")
+    message = {
+        "role": _API_ROLES.get(role, role),
+        "content": data.get("c", ""),
+        "created_at": data.get("ts"),
+    }
+    if data.get("id"):
+        message["id"] = data["id"]
+    if data.get("tid"):
+        message["tool_call_id"] = data["tid"]
+    if data.get("st"):
+        message["status"] = data["st"]
+    return message
+
+
+def _normalize(raw: Any) -> Dict[str, Any]:
+    """Convert a legacy stored message into the current tagged format."""
+    if isinstance(raw, str):
+        return {"v": CODEC_VERSION, "r": "human", "c": raw}
+    if not isinstance(raw, dict):
+        return {"v": CODEC_VERSION, "r": "unknown", "c": str(raw)}
+    if raw.get("v") == CODEC_VERSION:
+        return raw
+
+    # LangChain to_json() output: {"lc": 1, "type": "constructor", "id": [..., "HumanMessage"], "kwargs": {...}}
+    if isinstance(raw.get("kwargs"), dict):
+        fields = raw["kwargs"]
+        role = fields.get("type") or _ROLE_ALIASES.get((raw.get("id") or [None])[-1])
+    else:
+        fields = raw
+        role = raw.get("type") or raw.get("role")
+
+    content = fields.get("content")
+    if content is None:
+        content = fields.get("text", fields.get("body", ""))
+
+    data = {
+        "v": CODEC_VERSION,
+        "r": _ROLE_ALIASES.get(role, role) or "unknown",
+        "c": content,
+    }
+    timestamp = fields.get("ts") or fields.get("created_at") or (fields.get("response_metadata") or {}).get("ts")
+    if timestamp:
+        data["ts"] = timestamp
+    if fields.get("id") and isinstance(fields["id"], str):
+        data["id"] = fields["id"]
+    if fields.get("tool_call_id"):
+        data["tid"] = fields["tool_call_id"]
+    if fields.get("status") and fields["status"] != "success":
+        data["st"] = fields["status"]
+    if fields.get("tool_calls"):
+        data["tc"] = fields["tool_calls"]
+    return data
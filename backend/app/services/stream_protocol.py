@@ -0,0 +1,128 @@
+"""
+/app/services/stream_protocol.py
+
+Server-sent event encoders for /chat/stream.
+
+v1 (default) sends the full response so far on every update, which the
+existing frontend renders by replacing its content:
+
+    data: {"content": "<full text>", "type": "response", "complete": false}
+
+v2 sends only the appended text, with a sequence id that increases by one per
+event and a full-content keyframe every STREAM_KEYFRAME_INTERVAL deltas, so a
+client that missed or mangled a delta can resynchronise:
+
+    data: {"seq": 7, "type": "delta", "text": "<new text>"}
+    data: {"seq": 8, "type": "keyframe", "content": "<full text>"}
+    data: {"seq": 9, "type": "tool_output", "content": "..."}
+    data: {"seq": 10, "type": "done", "content": "<full text>", "tool_outputs": [...]}
+    data: {"seq": 11, "type": "error", "content": "Error: ..."}
+
+Clients opt into v2 with "protocol": "v2" in the request body.
+"""
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from app.core.config import settings
+
+PROTOCOL_VERSIONS = ("v1", "v2")
+
+
+def sse_frame(payload: Dict[str, Any]) -> str:
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
+class StreamEncoderV1:
+    """Legacy full-content protocol"""
+
+    version = "v1"
+    # Response frames carry the whole content, so a buffered one supersedes the previous
+    snapshots = True
+
+    def __init__(self):
+        self.content = ""
+        self.tool_outputs: List[str] = []
+
+    def response(self, content: str, delta: bool = False) -> Optional[str]:
+        if not content:
+            return None
+        self.content = self.content + content if delta else content
+        return sse_frame({"content": self.content, "type": "response", "complete": False})
+
+    def tool_output(self, content: str) -> str:
+        self.tool_outputs.append(content)
+        return sse_frame({"content": content, "type": "tool_output", "complete": True})
+
+    def event(self, event_type: str, content: str) -> str:
+        return sse_frame({"content": content, "type": event_type, "complete": True})
+
+    def complete(self, tool_outputs: Optional[List[str]] = None) -> str:
+        return sse_frame({
+            "content": self.content,
+            "type": "response",
+            "complete": True,
+            "tool_outputs": tool_outputs or self.tool_outputs
+        })
+
+    def error(self, message: str) -> str:
+        return self.event("error", message)
+
+
+class StreamEncoderV2(StreamEncoderV1):
+    """Delta protocol with sequence ids and periodic keyframes"""
+
+    version = "v2"
+    snapshots = False
+
+    def __init__(self, keyframe_interval: Optional[int] = None):
+        super().__init__()
+        self.keyframe_interval = (
+            settings.STREAM_KEYFRAME_INTERVAL if keyframe_interval is None else keyframe_interval
+        )
+        self.seq = 0
+        self._deltas_since_keyframe = 0
+
+    def _frame(self, payload: Dict[str, Any]) -> str:
+        self.seq += 1
+        return sse_frame({"seq": self.seq, **payload})
+
+    def response(self, content: str, delta: bool = False) -> Optional[str]:
+        if not content:
+            return None
+        if not delta:
+            # A whole message replaces the content, which only a keyframe can express
+            self.content = content
+            self._deltas_since_keyframe = 0
+            return self._frame({"type": "keyframe", "content": self.content})
+
+        self.content += content
+        frame = self._frame({"type": "delta", "text": content})
+        self._deltas_since_keyframe += 1
+        if self.keyframe_interval > 0 and self._deltas_since_keyframe >= self.keyframe_interval:
+            self._deltas_since_keyframe = 0
+            frame += self._frame({"type": "keyframe", "content": self.content})
+        return frame
+
+    def tool_output(self, content: str) -> str:
+        self.tool_outputs.append(content)
+        return self._frame({"type": "tool_output", "content": content})
+
+    def event(self, event_type: str, content: str) -> str:
+        return self._frame({"type": event_type, "content": content})
+
+    def complete(self, tool_outputs: Optional[List[str]] = None) -> str:
+        return self._frame({
+            "type": "done",
+            "content": self.content,
+            "tool_outputs": tool_outputs or self.tool_outputs
+        })
+
+
+def get_stream_encoder(version: Optional[str] = None) -> StreamEncoderV1:
+    """Return an encoder for the requested protocol version (default v1)"""
+    if version in (None, "", "v1"):
+        return StreamEncoderV1()
+    if version == "v2":
+        return StreamEncoderV2()
+    raise ValueError(f"Unknown stream protocol: {version}. Expected one of {PROTOCOL_VERSIONS}")
@@ -0,0 +1,199 @@
+"""
+/app/services/stream_registry.py
+
+Resumable chat streams.
+
+Each generation runs as a background task that writes its SSE frames into a
+bounded per-thread ring buffer, independent of the HTTP connection that
+started it. Every frame gets an SSE id of the form "<stream_id>:<index>", so
+a client that drops the connection can reconnect with Last-Event-ID, get the
+frames it missed replayed and keep following the live generation instead of
+paying for a new one.
+
+Finished buffers are kept for STREAM_BUFFER_TTL seconds and evicted lazily.
+A buffer holds at most STREAM_BUFFER_MAX_EVENTS frames and
+STREAM_BUFFER_MAX_BYTES bytes. v1 response frames carry the whole response so
+far, so each one replaces the previous one: a long v1 response costs the size
+of its latest frame, not the sum of all of them.
+
+If a reconnect asks for frames that already fell out of the ring, the replay
+starts at the oldest frame still buffered: v1 frames carry the full content
+anyway, and v2 clients see the seq gap and resynchronise on the next keyframe.
+
+Each buffer records the user whose request started it, and is only handed out
+to that user.
+"""
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple, Union
+from uuid import uuid4
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# What a generation yields: frame strings, or (frames, snapshot) pairs
+Frames = Union[str, Tuple[str, bool]]
+
+
+class StreamBuffer:
+    """Ring buffer of one generation's SSE frames"""
+
+    def __init__(self, thread_id: str, user_id: int, max_events: int, max_bytes: int):
+        self.thread_id = thread_id
+        self.user_id = user_id
+        self.stream_id = uuid4().hex[:12]
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.events: Deque[Tuple[int, str]] = deque()
+        self.bytes = 0
+        self.next_index = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        # The buffered full-content frame that the next snapshot replaces
+        self._snapshot: Optional[Tuple[int, str]] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, frames: str, snapshot: bool = False) -> None:
+        """
+        Append one or more "data: ...\n\n" frames.
+
+        A snapshot frame carries the whole response so far (v1), so it replaces
+        the previous snapshot instead of adding to it: a client resuming from
+        before that one needs only the latest.
+        """
+        async with self._changed:
+            for frame in frames.split("\n\n"):
+                if not frame:
+                    continue
+                if snapshot and self._snapshot is not None:
+                    self._remove(self._snapshot)
+                event = (self.next_index, frame)
+                self.events.append(event)
+                self.bytes += len(frame)
+                self.next_index += 1
+                if snapshot:
+                    self._snapshot = event
+            # Drop the oldest frames beyond the count or byte budget, always keeping the newest
+            while len(self.events) > 1 and (len(self.events) > self.max_events or self.bytes > self.max_bytes):
+                self._remove(self.events[0])
+            self._changed.notify_all()
+
+    def _remove(self, event: Tuple[int, str]) -> None:
+        try:
+            self.events.remove(event)
+        except ValueError:
+            return
+        self.bytes -= len(event[1])
+        if event is self._snapshot:
+            self._snapshot = None
+
+    async def close(self) -> None:
+        async with self._changed:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._changed.notify_all()
+
+    def _resume_index(self, last_event_id: Optional[str]) -> int:
+        if not last_event_id:
+            return 0
+        stream_id, _, index = last_event_id.partition(":")
+        if stream_id != self.stream_id or not index.isdigit():
+            # An id from an earlier generation of this thread: replay this one from the start
+            return 0
+        return int(index) + 1
+
+    async def follow(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the frames after last_event_id, then live frames until the generation ends"""
+        index = self._resume_index(last_event_id)
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.next_index > index or self.done)
+                pending = [(i, frame) for i, frame in self.events if i >= index]
+                done = self.done
+
+            for i, frame in pending:
+                yield f"id: {self.stream_id}:{i}\n{frame}\n\n"
+                index = i + 1
+
+            if done and index >= self.next_index:
+                return
+
+
+class StreamRegistry:
+    """Per-thread stream buffers and the generation tasks that fill them"""
+
+    def __init__(
+        self,
+        max_events: Optional[int] = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.max_events = settings.STREAM_BUFFER_MAX_EVENTS if max_events is None else max_events
+        self.max_bytes = settings.STREAM_BUFFER_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = settings.STREAM_BUFFER_TTL if ttl is None else ttl
+        self._buffers: Dict[str, StreamBuffer] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [
+            thread_id for thread_id, buffer in self._buffers.items()
+            if buffer.done and now - buffer.finished_at >= self.ttl
+        ]
+        for thread_id in expired:
+            del self._buffers[thread_id]
+        if expired:
+            logger.info(f"Evicted {len(expired)} finished stream buffers")
+
+    def get(self, thread_id: str, user_id: int) -> Optional[StreamBuffer]:
+        """The thread's current or recently finished stream, if any and started by user_id"""
+        self._evict_expired()
+        buffer = self._buffers.get(thread_id)
+        if buffer is None or buffer.user_id != user_id:
+            return None
+        return buffer
+
+    def start(self, thread_id: str, user_id: int, frames: AsyncIterator[Frames]) -> StreamBuffer:
+        """
+        Run a generation for user_id in the background, replacing the thread's previous stream.
+
+        `frames` yields SSE frame strings, or (frames, snapshot) pairs for full-content
+        frames that supersede the previous one (see StreamBuffer.publish).
+        """
+        self._evict_expired()
+        buffer = StreamBuffer(thread_id, user_id, self.max_events, self.max_bytes)
+        self._buffers[thread_id] = buffer
+
+        task = asyncio.create_task(self._run(buffer, frames))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return buffer
+
+    @staticmethod
+    async def _run(buffer: StreamBuffer, frames: AsyncIterator[Frames]) -> None:
+        try:
+            async for frame in frames:
+                if isinstance(frame, str):
+                    await buffer.publish(frame)
+                else:
+                    await buffer.publish(*frame)
+        except Exception as e:
+            logger.error(f"Error in stream for thread: {buffer.thread_id}: {e}")
+        finally:
+            await buffer.close()
+            logger.info(f"Stream {buffer.stream_id} for thread: {buffer.thread_id} finished ({buffer.next_index} events)")
+
+    def stats(self) -> Dict[str, int]:
+        self._evict_expired()
+        return {
+            "buffers": len(self._buffers),
+            "running": sum(1 for buffer in self._buffers.values() if not buffer.done),
+            "buffered_bytes": sum(buffer.bytes for buffer in self._buffers.values()),
+        }
+
+
+stream_registry = StreamRegistry()
@@ -0,0 +1,97 @@
+"""
+/app/services/thread_list_cache.py
+
+Per-user version counters and rendered-response cache for GET /threads.
+
+Every change that affects a user's thread list (create, archive, title change,
+activity update) bumps that user's version once its transaction commits. A
+rendered list is cached together with the version it was read at and is only
+served while that version is still current, so an unchanged list costs
+neither a query nor serialization, and a matching If-None-Match costs nothing
+but a 304.
+
+ETags are hashes of the rendered body, so they are strong and agree across
+worker processes. The version counters are per process; the cache TTL bounds
+how long a change made through another worker can go unnoticed.
+"""
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+import hashlib
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import ByteLRUCache
+from app.core.config import settings
+
+# session.info key holding the user ids to bump when the session commits
+_PENDING_KEY = "thread_list_bumps"
+
+
+class ThreadListCache:
+    """Rendered thread lists, valid for one version of the user's thread list"""
+
+    def __init__(self, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._entries = ByteLRUCache(
+            settings.THREAD_LIST_CACHE_MAX_BYTES if max_bytes is None else max_bytes,
+            ttl=settings.THREAD_LIST_CACHE_TTL if ttl is None else ttl,
+            sizeof=lambda entry: len(entry[2]) + 256
+        )
+
+    def version(self, user_id: int) -> int:
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def bump(self, user_id: int) -> None:
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def bump_after_commit(self, session: AsyncSession, user_id: Optional[int]) -> None:
+        """Bump the user's version when the session's transaction commits (not before,
+        or a concurrent read could cache the old list under the new version)"""
+        if user_id is None:
+            return
+        session.sync_session.info.setdefault(_PENDING_KEY, set()).add(user_id)
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    def get(self, user_id: int, params: Hashable) -> Optional[Tuple[str, bytes, Dict[str, str]]]:
+        """(etag, body, headers) rendered at the user's current version, if cached"""
+        entry = self._entries.get((user_id, params))
+        if entry is None:
+            return None
+        version, etag, body, headers = entry
+        if version != self.version(user_id):
+            return None
+        return etag, body, headers
+
+    def set(self, user_id: int, params: Hashable, version: int, body: bytes, headers: Dict[str, str]) -> str:
+        """Cache a rendered list read at `version`; returns its ETag"""
+        etag = self.etag(body)
+        self._entries.set((user_id, params), (version, etag, body, headers))
+        return etag
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            users = len(self._versions)
+        return {"users": users, **self._entries.stats()}
+
+
+thread_list_cache = ThreadListCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session: Session) -> None:
+    user_ids: Set[int] = session.info.pop(_PENDING_KEY, set())
+    for user_id in user_ids:
+        thread_list_cache.bump(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
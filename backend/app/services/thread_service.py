@@ -1,11 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text, update
+import base64
 import uuid
 from datetime import datetime
 from fastapi import Depends
 from app.core.db import get_db
 from app.models.thread import Thread
-from typing import List, Dict, Any, Optional
+from app.services.thread_list_cache import thread_list_cache
+from app.services.activity_aggregator import thread_activity
+from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.future import select
 
 class ThreadService:
@@ -39,6 +42,7 @@ class ThreadService:
         try:
             result = await self.db.execute(text(query), values)
             returned_thread_id = result.scalar_one()
+            thread_list_cache.bump_after_commit(self.db, user_id)
             return returned_thread_id
         except Exception as e:
             print(f"Error creating thread: {e}")
@@ -47,9 +51,16 @@ class ThreadService:
     async def get_threads_for_user(
             self, user_id: int, 
             include_archived: bool = False,
-            thread_id: str = None
+            thread_id: str = None,
+            limit: Optional[int] = None,
+            after: Optional[Tuple[datetime, str]] = None
         ) -> List[Dict[str, Any]]:
-        """Get all threads for a user, or a specific thread if thread_id is provided"""
+        """
+        Get all threads for a user, or a specific thread if thread_id is provided.
+        
+        With `limit`, at most that many threads are returned, starting after the
+        (last_activity_at, thread_id) position `after` (keyset pagination).
+        """
         query = """
         SELECT thread_id, title, context_type, task_type, created_at, last_activity_at, is_archived
         FROM threads
@@ -64,23 +75,42 @@ class ThreadService:
         
         if not include_archived:
             query += " AND is_archived = FALSE"
+        
+        if after:
+            # Row comparison matches the index order, so the scan starts right at the cursor
+            query += " AND (last_activity_at, thread_id) < (:after_activity, cast(:after_thread_id as uuid))"
+            params["after_activity"], params["after_thread_id"] = after
             
-        query += " ORDER BY last_activity_at DESC"
+        query += " ORDER BY last_activity_at DESC, thread_id DESC"
+        
+        if limit:
+            query += " LIMIT :limit"
+            params["limit"] = limit
         
         result = await self.db.execute(text(query), params)
         rows = result.fetchall()
         
         return [dict(row._mapping) for row in rows]
+    
+    @staticmethod
+    def encode_cursor(thread: Dict[str, Any]) -> str:
+        """Opaque cursor pointing just after the given thread in the listing order"""
+        position = f"{thread['last_activity_at'].isoformat()}|{thread['thread_id']}"
+        return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """Raises ValueError for a malformed cursor"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            activity, thread_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+            return datetime.fromisoformat(activity), str(uuid.UUID(thread_id))
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
         
     async def update_thread_activity(self, thread_id: str) -> None:
-        """Update the last_activity_at timestamp for a thread"""
-        query = """
-        UPDATE threads
-        SET last_activity_at = NOW()
-        WHERE thread_id = :thread_id
-        """
-        
-        await self.db.execute(text(query), {"thread_id": thread_id})
+        """Mark a thread as active now; last_activity_at is written behind in batches"""
+        thread_activity.record(thread_id)
         
     async def archive_thread(self, thread_id: str, user_id: int) -> bool:
         """Archive a thread belonging to a user"""
@@ -92,23 +122,86 @@ class ThreadService:
         """
         
         result = await self.db.execute(text(query), {"thread_id": thread_id, "user_id": user_id})
-        return result.scalar_one_or_none() is not None 
+        archived = result.scalar_one_or_none() is not None
+        if archived:
+            thread_list_cache.bump_after_commit(self.db, user_id)
+        return archived
         
+    @staticmethod
+    def title_from_message(message: str) -> str:
+        """Generate a concise title from the message (max 50 chars)"""
+        return message[:47] + "..." if len(message) > 50 else message
+
     async def update_thread_title_from_first_message(self, thread_id: str, message: str) -> None:
         """
         Generate and update a thread title based on the first message
         """
-        # Generate a concise title from the message (max 50 chars)
-        title = message[:47] + "..." if len(message) > 50 else message
+        title = self.title_from_message(message)
         
         # Update the title in the database
         query = """
         UPDATE threads 
         SET title = :title 
         WHERE thread_id = :thread_id AND (title IS NULL OR title = '')
+        RETURNING user_id
         """
         
-        await self.db.execute(text(query), {
+        result = await self.db.execute(text(query), {
             "thread_id": thread_id, 
             "title": title
-        }) 
\ No newline at end of file
+        })
+        thread_list_cache.bump_after_commit(self.db, result.scalar_one_or_none())
+
+    async def bootstrap_turn(
+            self, thread_id: str,
+            message: str,
+            user_id: int
+        ) -> Optional[Dict[str, Any]]:
+        """
+        Prepare a chat turn in one round trip: check the thread exists and belongs
+        to user_id, set its title from the message if it has none
+        and return the stored checkpoint row. The row is only rewritten when the
+        title changes; the caller records the activity with the
+        activity aggregator once the turn's transaction has committed.
+        
+        Returns:
+            {"thread_id", "user_id", "title", "state", "state_blob"} (state and state_blob are
+            None if the thread has no checkpoint yet), or None if the thread does
+            not exist or is not the user's
+        """
+        query = """
+        WITH turn AS (
+            SELECT thread_id, user_id, title
+            FROM threads
+            WHERE thread_id = cast(:thread_id as uuid)
+              AND user_id = cast(:user_id as integer)
+        ),
+        titled AS (
+            UPDATE threads
+            SET title = :title
+            FROM turn
+            WHERE threads.thread_id = turn.thread_id
+              AND (turn.title IS NULL OR turn.title = '')
+            RETURNING threads.thread_id, threads.title
+        )
+        SELECT turn.thread_id::text AS thread_id, turn.user_id,
+               COALESCE(titled.title, turn.title) AS title,
+               titled.thread_id IS NOT NULL AS retitled,
+               c.state, c.state_blob
+        FROM turn
+        LEFT JOIN titled ON titled.thread_id = turn.thread_id
+        LEFT JOIN langgraph_checkpoints c ON c.thread_id = turn.thread_id
+        """
+        
+        result = await self.db.execute(text(query), {
+            "thread_id": thread_id,
+            "user_id": user_id,
+            "title": self.title_from_message(message)
+        })
+        row = result.fetchone()
+        if row is None:
+            return None
+        turn = dict(row._mapping)
+        if turn.pop("retitled"):
+            thread_list_cache.bump_after_commit(self.db, row.user_id)
+        return turn
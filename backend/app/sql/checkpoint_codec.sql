@@ -0,0 +1,12 @@
+-- Binary checkpoint codecs (CHECKPOINT_CODEC=orjson|msgpack|msgpack_zstd) store a
+-- header-tagged blob instead of JSONB. Existing JSONB rows keep reading as before.
+ALTER TABLE langgraph_checkpoints ADD COLUMN IF NOT EXISTS state_blob BYTEA;
+ALTER TABLE langgraph_checkpoints ALTER COLUMN state DROP NOT NULL;
+
+-- Exactly one of the two representations must be present
+ALTER TABLE langgraph_checkpoints
+    ADD CONSTRAINT langgraph_checkpoints_state_present
+    CHECK (state IS NOT NULL OR state_blob IS NOT NULL);
+
+-- Delta rows written by a binary codec keep messages and state_patch in one blob
+ALTER TABLE langgraph_checkpoint_deltas ADD COLUMN IF NOT EXISTS payload BYTEA;
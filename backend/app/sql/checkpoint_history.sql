@@ -0,0 +1,19 @@
+-- Checkpoint history (used when CHECKPOINT_HISTORY_ENABLED=true)
+
+-- Content-addressed message bodies, shared by every version and thread that contains them
+CREATE TABLE IF NOT EXISTS checkpoint_messages (
+    message_hash TEXT PRIMARY KEY,  -- blake2b-128 of the encoded message without its timestamp and id
+    message JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- One row per saved checkpoint; messages are referenced, not copied
+CREATE TABLE IF NOT EXISTS checkpoint_versions (
+    thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    message_refs JSONB NOT NULL,    -- [[message_hash, timestamp, message_id], ...] in conversation order
+    state_patch JSONB NOT NULL,     -- Non-message keys (context, task_flags, summary)
+    message_count INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (thread_id, version)
+);
@@ -0,0 +1,53 @@
+-- Promote thread_id from the JSONB checkpoint_key to a first-class, indexed
+-- UUID column referencing threads.
+
+ALTER TABLE langgraph_checkpoints ADD COLUMN IF NOT EXISTS thread_id UUID;
+
+-- Backfill from the JSONB key; keys that are not UUIDs cannot reference a thread
+UPDATE langgraph_checkpoints
+SET thread_id = (checkpoint_key->>'thread_id')::uuid
+WHERE thread_id IS NULL
+  AND checkpoint_key->>'thread_id' ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$';
+
+-- Checkpoints without an existing thread are unreachable and would violate the foreign key
+DELETE FROM langgraph_checkpoints c
+WHERE c.thread_id IS NULL
+   OR NOT EXISTS (SELECT 1 FROM threads t WHERE t.thread_id = c.thread_id);
+
+ALTER TABLE langgraph_checkpoints ALTER COLUMN thread_id SET NOT NULL;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'langgraph_checkpoints_thread_id_fkey') THEN
+        ALTER TABLE langgraph_checkpoints
+            ADD CONSTRAINT langgraph_checkpoints_thread_id_fkey
+            FOREIGN KEY (thread_id) REFERENCES threads(thread_id) ON DELETE CASCADE;
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_langgraph_checkpoints_thread_id
+    ON langgraph_checkpoints (thread_id);
+
+-- The expression and GIN indexes on checkpoint_key are no longer used by any query
+DROP INDEX IF EXISTS idx_langgraph_checkpoints_unique_key;
+DROP INDEX IF EXISTS idx_langgraph_checkpoint_key;
+-- Relied on the expression index for ON CONFLICT
+DROP FUNCTION IF EXISTS test_jsonb_insert();
+
+-- Same treatment for the delta log (see langgraph_checkpoint_deltas.sql)
+DELETE FROM langgraph_checkpoint_deltas d
+WHERE d.thread_id::text !~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+   OR NOT EXISTS (SELECT 1 FROM threads t WHERE t.thread_id::text = d.thread_id::text);
+
+ALTER TABLE langgraph_checkpoint_deltas ALTER COLUMN thread_id TYPE UUID USING thread_id::uuid;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'langgraph_checkpoint_deltas_thread_id_fkey') THEN
+        ALTER TABLE langgraph_checkpoint_deltas
+            ADD CONSTRAINT langgraph_checkpoint_deltas_thread_id_fkey
+            FOREIGN KEY (thread_id) REFERENCES threads(thread_id) ON DELETE CASCADE;
+    END IF;
+END;
+$$;
@@ -0,0 +1,21 @@
+-- Track how many messages the snapshot row holds so the delta writer
+-- does not have to read the whole state to find its append position
+ALTER TABLE langgraph_checkpoints ADD COLUMN IF NOT EXISTS message_count INTEGER;
+
+UPDATE langgraph_checkpoints
+SET message_count = COALESCE(jsonb_array_length(state->'messages'), 0)
+WHERE message_count IS NULL;
+
+-- Append-only log of checkpoint changes (used when CHECKPOINT_STORAGE_MODE=delta)
+CREATE TABLE IF NOT EXISTS langgraph_checkpoint_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
+    messages JSONB NOT NULL DEFAULT '[]'::jsonb,  -- Only the messages appended by this save
+    state_patch JSONB,                            -- Top-level keys (context, task_flags) that changed
+    message_count INTEGER NOT NULL,               -- Total message count after applying this delta
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Deltas are always read and counted per thread in insertion order
+CREATE INDEX IF NOT EXISTS idx_langgraph_checkpoint_deltas_thread
+    ON langgraph_checkpoint_deltas (thread_id, id);
@@ -4,24 +4,14 @@ DROP TABLE IF EXISTS langgraph_checkpoints;
 -- Create the table with proper JSONB columns
 CREATE TABLE IF NOT EXISTS langgraph_checkpoints (
     id SERIAL PRIMARY KEY,  -- Add an explicit ID for easier management
+    thread_id UUID NOT NULL REFERENCES threads(thread_id) ON DELETE CASCADE,
     checkpoint_key JSONB NOT NULL,
-    state JSONB NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+    state JSONB,            -- Written by the legacy "json" codec
+    state_blob BYTEA,       -- Written by binary codecs, starts with a codec header
+    message_count INTEGER,  -- Number of messages in state, used by the delta writer
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    CONSTRAINT langgraph_checkpoints_state_present CHECK (state IS NOT NULL OR state_blob IS NOT NULL)
 );
 
--- Create constraint to ensure checkpoint_key is unique
-CREATE UNIQUE INDEX idx_langgraph_checkpoints_unique_key ON langgraph_checkpoints ((checkpoint_key->>'thread_id'));
-
--- Create GIN index for faster JSONB queries
-CREATE INDEX idx_langgraph_checkpoint_key ON langgraph_checkpoints USING GIN (checkpoint_key);
-
--- Create a function to be used to test JSONB insertion
-CREATE OR REPLACE FUNCTION test_jsonb_insert() 
-RETURNS VOID AS $$
-BEGIN
-    INSERT INTO langgraph_checkpoints (checkpoint_key, state)
-    VALUES ('{"thread_id": "test-thread-id"}'::jsonb, '{"messages": [], "context": {"type": "test"}}'::jsonb)
-    ON CONFLICT ((checkpoint_key->>'thread_id')) DO UPDATE
-    SET state = '{"messages": [], "context": {"type": "test-updated"}}'::jsonb;
-END;
-$$ LANGUAGE plpgsql; 
\ No newline at end of file
+-- One checkpoint per thread; all lookups are a btree probe on thread_id
+CREATE UNIQUE INDEX idx_langgraph_checkpoints_thread_id ON langgraph_checkpoints (thread_id);
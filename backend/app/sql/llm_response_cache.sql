@@ -0,0 +1,12 @@
+-- Shared tier of the LLM response cache (used when LLM_CACHE_DB_ENABLED=true)
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key TEXT PRIMARY KEY,     -- blake2b-128 of system prompt, history, tool schemas and model parameters
+    response JSONB NOT NULL,        -- The AI message in the message codec format, without timestamp and id
+    context_type VARCHAR(50),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Expired entries are deleted in bulk every LLM_CACHE_DB_PURGE_EVERY writes
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at
+    ON llm_response_cache (expires_at);
@@ -10,4 +10,11 @@
    );
 
    CREATE INDEX idx_threads_user_id ON threads(user_id);
-   CREATE INDEX idx_threads_last_activity ON threads(last_activity_at);
\ No newline at end of file
+   CREATE INDEX idx_threads_last_activity ON threads(last_activity_at);
+   -- Thread listing: equality on (user_id, is_archived), keyset order on (last_activity_at, thread_id),
+   -- and the listed columns included so the side panel is served by an index-only scan
+   CREATE INDEX idx_threads_user_listing ON threads (user_id, is_archived, last_activity_at DESC, thread_id DESC)
+       INCLUDE (title, context_type, task_type, created_at);
+   -- Listing with archived threads (no is_archived equality), in the same keyset order
+   CREATE INDEX idx_threads_user_listing_all ON threads (user_id, last_activity_at DESC, thread_id DESC)
+       INCLUDE (title, context_type, task_type, created_at, is_archived);
@@ -0,0 +1,12 @@
+-- Migration: covering index for keyset-paginated thread listing (GET /threads)
+-- Equality on (user_id, is_archived), keyset order on (last_activity_at, thread_id) and the
+-- listed columns included, so a page is read with an index-only scan
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_threads_user_listing
+    ON threads (user_id, is_archived, last_activity_at DESC, thread_id DESC)
+    INCLUDE (title, context_type, task_type, created_at);
+
+-- include_archived=true does not constrain is_archived, so the index above cannot return rows
+-- in (last_activity_at, thread_id) order for it; this one serves that listing the same way
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_threads_user_listing_all
+    ON threads (user_id, last_activity_at DESC, thread_id DESC)
+    INCLUDE (title, context_type, task_type, created_at, is_archived);
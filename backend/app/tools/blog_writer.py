@@ -1,10 +1,12 @@
 from langchain_core.tools import tool
+from app.tools.cache import cached_tool
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 @tool
+@cached_tool(ttl=24 * 60 * 60)
 def blog_writer(query: str) -> str:
     """
     This tool is used to write a blog post.
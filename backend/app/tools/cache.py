@@ -0,0 +1,179 @@
+"""
+/app/tools/cache.py
+
+Memoization for tools whose result depends only on their arguments.
+
+    @tool
+    @cached_tool(ttl=900)
+    def research(query: str) -> str:
+        ...
+
+Results are kept in one byte-bounded LRU shared by all tools
+(TOOL_CACHE_MAX_BYTES), each tool with its own TTL; TOOL_CACHE_TTLS overrides
+the decorator's TTL per tool, and a TTL of 0 turns caching off. Identical calls
+that arrive while the first one is still running wait for its result instead
+of running again (single flight), which matters for the thread-pooled sync
+tools as much as for async ones; a sync follower waits at most the tool's
+TOOL_TIMEOUTS entry. Failures are never cached.
+"""
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+
+import orjson
+
+from app.core.cache import ByteLRUCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+tool_result_cache = ByteLRUCache(settings.TOOL_CACHE_MAX_BYTES)
+
+_MISSING = object()
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _count(tool_name: str, field: str) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(tool_name, {"hits": 0, "misses": 0, "coalesced": 0})
+        counters[field] += 1
+
+
+def _call_key(tool_name: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    try:
+        encoded = orjson.dumps([args, kwargs], option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        encoded = repr((args, sorted(kwargs.items()))).encode()
+    return ("tool", tool_name, encoded)
+
+
+class _Flight:
+    """One in-progress call that identical calls can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def cached_tool(ttl: float, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Memoize a sync or async tool function.
+
+    Args:
+        ttl: Seconds a result stays cached (TOOL_CACHE_TTLS[name] takes precedence)
+        name: Key for TTL overrides and metrics; defaults to the function name
+    """
+    def decorator(func: Callable) -> Callable:
+        tool_name = name or func.__name__
+
+        def effective_ttl() -> float:
+            return settings.TOOL_CACHE_TTLS.get(tool_name, ttl)
+
+        if inspect.iscoroutinefunction(func):
+            flights: Dict[Hashable, asyncio.Future] = {}
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if effective_ttl() <= 0:
+                    return await func(*args, **kwargs)
+
+                key = _call_key(tool_name, args, kwargs)
+                cached = tool_result_cache.get(key, _MISSING)
+                if cached is not _MISSING:
+                    _count(tool_name, "hits")
+                    return cached
+
+                flight = flights.get(key)
+                if flight is not None:
+                    _count(tool_name, "coalesced")
+                    return await asyncio.shield(flight)
+
+                _count(tool_name, "misses")
+                flight = asyncio.get_running_loop().create_future()
+                flights[key] = flight
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException as e:
+                    flight.set_exception(e)
+                    # Mark retrieved so an unawaited failure is not logged as never retrieved
+                    flight.exception()
+                    raise
+                else:
+                    tool_result_cache.set(key, result, ttl=effective_ttl())
+                    flight.set_result(result)
+                    return result
+                finally:
+                    flights.pop(key, None)
+
+            return async_wrapper
+
+        flights_lock = threading.Lock()
+        sync_flights: Dict[Hashable, _Flight] = {}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if effective_ttl() <= 0:
+                return func(*args, **kwargs)
+
+            key = _call_key(tool_name, args, kwargs)
+            cached = tool_result_cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                _count(tool_name, "hits")
+                return cached
+
+            with flights_lock:
+                flight = sync_flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _Flight()
+                    sync_flights[key] = flight
+
+            if not leader:
+                _count(tool_name, "coalesced")
+                # Bounded like the call itself, so a hung leader cannot pin followers' pool threads
+                timeout = settings.TOOL_TIMEOUTS.get(tool_name, settings.TOOL_TIMEOUT_DEFAULT)
+                if not flight.done.wait(timeout=timeout):
+                    # Let the next call start afresh instead of joining the stuck one
+                    with flights_lock:
+                        if sync_flights.get(key) is flight:
+                            del sync_flights[key]
+                    raise TimeoutError(f"Timed out after {timeout}s waiting for an identical {tool_name} call")
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+
+            _count(tool_name, "misses")
+            # The leader always releases its followers and its flight entry, even on failure
+            try:
+                flight.result = func(*args, **kwargs)
+                tool_result_cache.set(key, flight.result, ttl=effective_ttl())
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with flights_lock:
+                    sync_flights.pop(key, None)
+                flight.done.set()
+
+        return wrapper
+
+    return decorator
+
+
+def tool_cache_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        per_tool = {}
+        for tool_name, counters in _stats.items():
+            calls = counters["hits"] + counters["misses"] + counters["coalesced"]
+            per_tool[tool_name] = {
+                **counters,
+                "hit_rate": (counters["hits"] + counters["coalesced"]) / calls if calls else 0.0,
+            }
+    return {"cache": tool_result_cache.stats(), "tools": per_tool}
@@ -1,6 +1,8 @@
 from langchain_core.tools import tool
+from app.tools.cache import cached_tool
 
 @tool
+@cached_tool(ttl=24 * 60 * 60)
 def code_assistant(query: str) -> str:
     """
     This tool is used to write code.
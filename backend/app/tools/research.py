@@ -1,6 +1,9 @@
 from langchain_core.tools import tool
+from app.tools.cache import cached_tool
 
+# Search results go stale quickly
 @tool
+@cached_tool(ttl=15 * 60)
 def research(query: str) -> str:
     """
     This tool is used to search the web for information.
@@ -1,6 +1,8 @@
 from langchain_core.tools import tool
+from app.tools.cache import cached_tool
 
 @tool
+@cached_tool(ttl=24 * 60 * 60)
 def video_processor(query: str) -> str:
     """
     This tool is used to process a video.
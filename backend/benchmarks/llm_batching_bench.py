@@ -0,0 +1,102 @@
+"""
+/benchmarks/llm_batching_bench.py
+
+Offline benchmark for LLM micro-batching, using a fake LLM so no API key or
+network is needed.
+
+The fake models an upstream with a fixed number of connections, a fixed
+per-request overhead (connection setup, auth, queueing) and a generation
+latency. Like the real chat model it has no batch endpoint: `abatch` is N
+concurrent `ainvoke` calls, each paying the full overhead. It compares a
+burst of /chat/message-style calls made one request each against the same
+burst sent through MicroBatcher, which does not reduce upstream requests; the
+difference shows the cost of the batching window and of the per-batch
+fan-out limit.
+
+Run from the backend directory:
+
+    python -m benchmarks.llm_batching_bench
+"""
+import asyncio
+import statistics
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agents.batching import MicroBatcher, llm_batch_caller
+from app.core.concurrency import llm_slot
+
+REQUESTS = 64
+ARRIVAL_SPREAD = 0.01  # Seconds over which the burst arrives
+
+
+class FakeLLM:
+    """Stands in for the chat model: ainvoke and abatch with simulated latency"""
+
+    def __init__(self, overhead: float = 0.05, latency: float = 0.2, connections: int = 4):
+        self.overhead = overhead
+        self.latency = latency
+        self.connections = connections
+        self._semaphore = None
+        self.requests = 0
+
+    def _connection(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.connections)
+        return self._semaphore
+
+    async def ainvoke(self, messages, config=None):
+        async with self._connection():
+            self.requests += 1
+            await asyncio.sleep(self.overhead + self.latency)
+        return AIMessage(content=f"echo: {messages[-1].content}")
+
+    async def abatch(self, inputs, config=None, return_exceptions=False):
+        # Runnable's default: one ainvoke per input, run concurrently
+        return await asyncio.gather(
+            *(self.ainvoke(messages) for messages in inputs),
+            return_exceptions=return_exceptions
+        )
+
+
+async def burst(call) -> list:
+    async def one(i: int) -> float:
+        await asyncio.sleep(ARRIVAL_SPREAD * i / REQUESTS)
+        started = time.perf_counter()
+        await call([HumanMessage(content=f"Write a blog about topic {i}")])
+        return time.perf_counter() - started
+
+    return await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+
+
+def report(label: str, latencies: list, elapsed: float, llm: FakeLLM) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<14} {REQUESTS / elapsed:8.1f} req/s   "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms   "
+        f"upstream requests {llm.requests}"
+    )
+
+
+async def main() -> None:
+    llm = FakeLLM()
+
+    async def unbatched(messages):
+        async with llm_slot():
+            return await llm.ainvoke(messages)
+
+    started = time.perf_counter()
+    latencies = await burst(unbatched)
+    report("one per call", latencies, time.perf_counter() - started, llm)
+
+    llm = FakeLLM()
+    batcher = MicroBatcher(llm_batch_caller(llm))
+    started = time.perf_counter()
+    latencies = await burst(batcher.submit)
+    report("micro-batched", latencies, time.perf_counter() - started, llm)
+    print(f"batches: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
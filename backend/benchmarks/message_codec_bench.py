@@ -0,0 +1,58 @@
+"""
+/benchmarks/message_codec_bench.py
+
+Micro-benchmark for the message codec: decode cost per 1k stored messages,
+for the current tagged format and for the legacy formats it still reads.
+
+Run from the backend directory:
+
+    python -m benchmarks.message_codec_bench
+"""
+import timeit
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.services.message_codec import decode_messages, encode_messages, to_api_dict
+
+MESSAGES_PER_BATCH = 1000
+REPEAT = 5
+NUMBER = 20
+
+
+def build_conversation(size: int = MESSAGES_PER_BATCH):
+    messages = []
+    for i in range(size // 4):
+        messages.append(HumanMessage(content=f"Write a blog about topic {i}"))
+        messages.append(AIMessage(
+            content="",
+            tool_calls=[{"name": "write_blog", "args": {"query": f"topic {i}"}, "id": f"call-{i}"}]
+        ))
+        messages.append(ToolMessage(content=f"# The Ultimate Guide to Topic {i}\n" * 20, tool_call_id=f"call-{i}"))
+        messages.append(AIMessage(content=f"Here is your blog post about topic {i}."))
+    return messages
+
+
+def report(label: str, func) -> None:
+    best = min(timeit.repeat(func, repeat=REPEAT, number=NUMBER)) / NUMBER
+    print(f"{label:<40} {best * 1000:8.2f} ms / {MESSAGES_PER_BATCH} messages")
+
+
+def main() -> None:
+    conversation = build_conversation()
+    tagged = encode_messages(conversation)
+    legacy_dicts = [
+        {"type": m.type, "content": m.content, "tool_call_id": getattr(m, "tool_call_id", None)}
+        for m in conversation
+    ]
+    legacy_lc_json = [m.to_json() for m in conversation]
+
+    report("encode (tagged v1)", lambda: encode_messages(conversation))
+    report("decode -> LangChain (tagged v1)", lambda: decode_messages(tagged))
+    report("decode -> LangChain (legacy type dicts)", lambda: decode_messages(legacy_dicts))
+    report("decode -> LangChain (legacy to_json)", lambda: decode_messages(legacy_lc_json))
+    report("decode -> API dicts (tagged v1)", lambda: [to_api_dict(m) for m in tagged])
+    report("decode -> API dicts (legacy type dicts)", lambda: [to_api_dict(m) for m in legacy_dicts])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+/benchmarks/turn_bootstrap_bench.py
+
+Per-turn database latency before a chat turn reaches the LLM: the previous
+three statements (title update, checkpoint load, activity update) against the
+single bootstrap query.
+
+Needs a reachable DATABASE_URL and an existing thread owned by user_id. The
+separate path bumps the thread's last_activity_at directly, as turns did
+before activity was written behind; the title is only set if it is empty. The
+checkpoint cache is cleared before each iteration so both paths read the
+checkpoint from the database.
+
+Run from the backend directory:
+
+    python -m benchmarks.turn_bootstrap_bench <thread_id> <user_id> [iterations]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.core.db import engine, session_scope
+from app.services.checkpoint_service import CheckpointService, checkpoint_cache
+from app.services.thread_service import ThreadService
+
+MESSAGE = "Write a blog about the history of espresso machines"
+
+
+async def separate_statements(thread_id: str, user_id) -> None:
+    async with session_scope() as session:
+        await ThreadService(session).update_thread_title_from_first_message(thread_id, MESSAGE)
+    async with session_scope() as session:
+        await CheckpointService(session).get_checkpoint({"thread_id": thread_id})
+    async with session_scope() as session:
+        await session.execute(
+            text("UPDATE threads SET last_activity_at = NOW() WHERE thread_id = :thread_id"),
+            {"thread_id": thread_id}
+        )
+
+
+async def single_bootstrap(thread_id: str, user_id) -> None:
+    async with session_scope() as session:
+        turn = await ThreadService(session).bootstrap_turn(thread_id, MESSAGE, user_id)
+    if turn:
+        CheckpointService.prime_cache(thread_id, turn["state"], turn["state_blob"])
+
+
+async def measure(label: str, turn, thread_id: str, user_id, iterations: int) -> None:
+    # Warm up the pool and the statement caches
+    for _ in range(5):
+        checkpoint_cache.clear()
+        await turn(thread_id, user_id)
+
+    timings = []
+    for _ in range(iterations):
+        checkpoint_cache.clear()
+        started = time.perf_counter()
+        await turn(thread_id, user_id)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(
+        f"{label:<22} mean {statistics.mean(timings):7.2f} ms   "
+        f"p50 {statistics.median(timings):7.2f} ms   p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms"
+    )
+
+
+async def main() -> None:
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    thread_id = sys.argv[1]
+    user_id = int(sys.argv[2])
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    # The engine logs every statement by default, which would dominate the timings
+    engine.echo = False
+    try:
+        await measure("3 separate statements", separate_statements, thread_id, user_id, iterations)
+        await measure("single bootstrap", single_bootstrap, thread_id, user_id, iterations)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
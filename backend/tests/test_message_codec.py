@@ -0,0 +1,27 @@
+from langchain_core.messages import AIMessage, ToolMessage
+
+from app.services.message_codec import decode_message, encode_message
+
+
+def test_tool_error_status_round_trips():
+    message = ToolMessage(content="Tool research timed out", tool_call_id="call-1", status="error")
+
+    decoded = decode_message(encode_message(message))
+
+    assert decoded.status == "error"
+    assert decoded.tool_call_id == "call-1"
+
+
+def test_successful_tool_result_omits_status():
+    encoded = encode_message(ToolMessage(content="ok", tool_call_id="call-1"))
+
+    assert "st" not in encoded
+    assert decode_message(encoded).status == "success"
+
+
+def test_tool_calls_round_trip():
+    message = AIMessage(content="", tool_calls=[{"name": "research", "args": {"query": "x"}, "id": "call-1"}])
+
+    decoded = decode_message(encode_message(message))
+
+    assert [call["id"] for call in decoded.tool_calls] == ["call-1"]
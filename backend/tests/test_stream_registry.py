@@ -0,0 +1,54 @@
+import asyncio
+
+from app.services.stream_protocol import StreamEncoderV1
+from app.services.stream_registry import StreamBuffer
+
+
+def test_long_v1_response_keeps_buffer_bounded():
+    async def run():
+        buffer = StreamBuffer("thread", 1, max_events=2048, max_bytes=1024 * 1024)
+        encoder = StreamEncoderV1()
+        largest_frame = 0
+        for _ in range(2000):
+            frame = encoder.response("token ", delta=True)
+            largest_frame = max(largest_frame, len(frame))
+            await buffer.publish(frame, snapshot=encoder.snapshots)
+        await buffer.publish(encoder.tool_output("tool result"))
+        await buffer.publish(encoder.complete(), snapshot=encoder.snapshots)
+        await buffer.close()
+        return buffer, encoder, largest_frame
+
+    buffer, encoder, largest_frame = asyncio.run(run())
+
+    # Only the final snapshot and the tool frame are kept, not every prefix of the response
+    assert len(buffer.events) == 2
+    assert buffer.bytes <= 2 * largest_frame
+    assert buffer.next_index == 2002
+
+
+def test_resume_replays_latest_snapshot_only():
+    async def run():
+        buffer = StreamBuffer("thread", 1, max_events=2048, max_bytes=1024 * 1024)
+        encoder = StreamEncoderV1()
+        for word in ("a", "b", "c"):
+            await buffer.publish(encoder.response(word, delta=True), snapshot=True)
+        await buffer.close()
+        return [frame async for frame in buffer.follow(f"{buffer.stream_id}:0")]
+
+    frames = asyncio.run(run())
+
+    assert len(frames) == 1
+    assert '"content":"abc"' in frames[0]
+
+
+def test_byte_budget_drops_oldest_frames():
+    async def run():
+        buffer = StreamBuffer("thread", 1, max_events=2048, max_bytes=1000)
+        for i in range(100):
+            await buffer.publish(f"data: {'x' * 90}{i:02d}\n\n")
+        return buffer
+
+    buffer = asyncio.run(run())
+
+    assert buffer.bytes <= 1000
+    assert buffer.events[-1][0] == 99